@@ -0,0 +1,172 @@
+#!python3
+# -*- coding: utf-8 -*-
+
+'''
+Measures the throughput and the peak memory use of the main operations of dewiktionaryparser on a (synthetic, by default) German wiktionary xml.
+
+Every stage runs in a separate process, so that its peak RSS (resident set size) is not inflated by the earlier stages.
+The stages working on a finished dictionary (inverse and commons dictionaries, json export and import) start from the json exported by the generating stages.
+Usage:
+python run_benchmarks.py [--pages N] [--mix noun=45,adj=15,...] [--dump EXISTING_XML] [--workdir DIR] [--json REPORT_JSON]
+'''
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))  # benchmark the working tree, not an installed version
+import dewiktionaryparser as dw
+from prettytable import PrettyTable
+from synthetic_dump import SyntheticDump, DEFAULT_MIX, parse_mix
+
+try:
+    import resource
+except ImportError:  # e.g., on Windows
+    resource = None
+
+
+def peak_rss_mb():
+    '''Returns the peak resident set size of the current process in MB (or None if it cannot be determined on the platform).'''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KB elsewhere
+
+
+########################################
+#  Benchmark stages                    #
+########################################
+# Each stage takes the path of the xml and of the working directory, and returns the number of items processed and the seconds it took.
+
+def timed_generation(dic, generate, dump_path, workdir, json_name):
+    start = time.perf_counter()
+    generate(dump_path)
+    seconds = time.perf_counter() - start
+    dic.export_to_json(os.path.join(workdir, json_name))
+    return sum(1 for _ in dw.iter_wiki_pages(dump_path)), seconds
+
+
+def bench_noun_entries(dump_path, workdir):
+    dic = dw.GermanNounEntriesDict()
+    return timed_generation(dic, dic.generate_entries, dump_path, workdir, 'noun_entries.json')
+
+
+def bench_adj_entries(dump_path, workdir):
+    dic = dw.GermanAdjEntriesDict()
+    return timed_generation(dic, dic.generate_entries, dump_path, workdir, 'adj_entries.json')
+
+
+def bench_noun_translations(dump_path, workdir):
+    dic = dw.GermanNounTranslationDict()
+    return timed_generation(dic, dic.generate_translations, dump_path, workdir, 'noun_translations.json')
+
+
+def bench_adj_translations(dump_path, workdir):
+    dic = dw.GermanAdjTranslationDict()
+    return timed_generation(dic, dic.generate_translations, dump_path, workdir, 'adj_translations.json')
+
+
+def bench_make_inv_dict(dump_path, workdir):
+    dic = dw.GermanNounEntriesDict()
+    dic.retrieve_from_json(os.path.join(workdir, 'noun_entries.json'))
+    start = time.perf_counter()
+    dic.make_inv_dict()
+    return len(dic), time.perf_counter() - start
+
+
+def bench_make_commons_dict(dump_path, workdir):
+    dic = dw.GermanNounEntriesDict()
+    dic.retrieve_from_json(os.path.join(workdir, 'noun_entries.json'))
+    start = time.perf_counter()
+    dic.make_commons_dict()
+    return len(dic), time.perf_counter() - start
+
+
+def bench_export_to_json(dump_path, workdir):
+    dic = dw.GermanNounEntriesDict()
+    dic.retrieve_from_json(os.path.join(workdir, 'noun_entries.json'))
+    start = time.perf_counter()
+    dic.export_to_json(os.path.join(workdir, 'noun_entries_export.json'))
+    return len(dic), time.perf_counter() - start
+
+
+def bench_retrieve_from_json(dump_path, workdir):
+    dic = dw.GermanNounEntriesDict()
+    start = time.perf_counter()
+    dic.retrieve_from_json(os.path.join(workdir, 'noun_entries.json'))
+    return len(dic), time.perf_counter() - start
+
+
+# (stage name, function, unit of the items counted), in the order of their dependencies:
+STAGES = [('generate_entries (nouns)', bench_noun_entries, 'pages'),
+          ('generate_entries (adjectives)', bench_adj_entries, 'pages'),
+          ('generate_translations (nouns)', bench_noun_translations, 'pages'),
+          ('generate_translations (adjectives)', bench_adj_translations, 'pages'),
+          ('make_inv_dict (nouns)', bench_make_inv_dict, 'entries'),
+          ('make_commons_dict', bench_make_commons_dict, 'entries'),
+          ('export_to_json (nouns)', bench_export_to_json, 'entries'),
+          ('retrieve_from_json (nouns)', bench_retrieve_from_json, 'entries')]
+
+
+def _run_stage(stage_no, dump_path, workdir, results):
+    '''Runs a stage in a child process (with the messages of the package silenced), and puts its measurements into the results queue.'''
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        items, seconds = STAGES[stage_no][1](dump_path, workdir)
+    results.put((items, seconds, peak_rss_mb()))
+
+
+def run_benchmarks(dump_path, workdir):
+    '''Runs all the stages on the xml at dump_path, and returns a list of their measurements as dictionaries.'''
+    context = multiprocessing.get_context('spawn')  # fresh processes, for comparable peak RSS values
+    report = []
+    for stage_no, (name, function, unit) in enumerate(STAGES):
+        results = context.Queue()
+        process = context.Process(target=_run_stage, args=(stage_no, dump_path, workdir, results))
+        process.start()
+        items, seconds, peak_rss = results.get()
+        process.join()
+        report.append({'stage': name, 'items': items, 'unit': unit, 'seconds': seconds,
+                       'items_per_second': items / seconds if seconds else None, 'peak_rss_mb': peak_rss})
+    return report
+
+
+def print_report(report):
+    table = PrettyTable(['stage', 'items', 'seconds', 'items/sec', 'peak RSS (MB)'])
+    table.align = 'r'
+    table.align['stage'] = 'l'
+    for row in report:
+        table.add_row([row['stage'], '{0} {1}'.format(row['items'], row['unit']), '{0:.2f}'.format(row['seconds']),
+                       '{0:.0f}'.format(row['items_per_second']) if row['items_per_second'] else '-',
+                       '{0:.1f}'.format(row['peak_rss_mb']) if row['peak_rss_mb'] is not None else 'n/a'])
+    print(table)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Benchmarks the dewiktionaryparser dictionaries on a synthetic (or real) German wiktionary xml.')
+    arg_parser.add_argument('--pages', type=int, default=20000, help='the number of pages of the synthetic xml (default: 20000)')
+    arg_parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help='the weights of the page types of the synthetic xml (see synthetic_dump.py)')
+    arg_parser.add_argument('--seed', type=int, default=0, help='the seed of the synthetic xml (default: 0)')
+    arg_parser.add_argument('--dump', help='benchmark on this xml (or .xml.bz2, .xml.gz dump) instead of a synthetic one')
+    arg_parser.add_argument('--workdir', help='the directory for the synthetic xml and the json files (default: a temporary directory)')
+    arg_parser.add_argument('--json', help='also save the measurements to this json file')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        workdir = args.workdir or temp_dir
+        dump_path = args.dump
+        if dump_path is None:
+            dump_path = os.path.join(workdir, 'synthetic_dewiktionary.xml')
+            print('Generating a synthetic xml of {0} pages . . .'.format(args.pages))
+            SyntheticDump(args.seed).write(dump_path, args.pages, args.mix)
+        print('Benchmarking on {0} . . .'.format(dump_path))
+        report = run_benchmarks(dump_path, workdir)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print('Measurements saved to {0}.'.format(args.json))
@@ -0,0 +1,161 @@
+#!python3
+# -*- coding: utf-8 -*-
+
+'''
+Generates a synthetic German wiktionary xml file for benchmarking the parsers (see run_benchmarks.py).
+
+The pages imitate the structure of the real dump: German nouns with (multi-declension, starred, dialectal) Übersicht tables,
+adjectives, translation lines with links, comments and references, pages of other languages and pages under wiktionary-namespaces.
+Usage:
+python synthetic_dump.py OUTPUT_XML [--pages N] [--mix noun=45,adj=15,other_german=10,non_german=20,namensraum=10] [--seed S]
+'''
+
+import argparse
+import hashlib
+import random
+from xml.sax.saxutils import escape
+
+# The default share (weight) of each page type:
+DEFAULT_MIX = {'noun': 45, 'adj': 15, 'other_german': 10, 'non_german': 20, 'namensraum': 10}
+
+SYLLABLES = ['ba', 'ber', 'bu', 'da', 'del', 'dorf', 'e', 'fal', 'fen', 'gar', 'ge', 'hal', 'hei', 'ka', 'kel', 'kir', 'la', 'lin', 'ma', 'mer',
+             'mut', 'na', 'nen', 'o', 'pa', 'pel', 'ra', 'ren', 'sa', 'schaft', 'schel', 'sto', 'ta', 'ter', 'tur', 'u', 'ung', 'wa', 'wer', 'zel']
+ENGLISH_WORDS = ['apple', 'house', 'tree', 'river', 'mother', 'cock', 'tap', 'valve', 'castle', 'lock', 'nut', 'bird', 'age', 'field', 'light',
+                 'beautiful', 'nice', 'fine', 'quick', 'old', 'heavy', 'bright', 'dark', 'even', 'square']
+OTHER_LANGUAGES = ['Englisch', 'Französisch', 'Niederländisch', 'Latein', 'Schwedisch']
+NAMESPACES = ['Hilfe', 'Verzeichnis', 'Wiktionary', 'Diskussion', 'Benutzer', 'Vorlage', 'Kategorie', 'Flexion', 'Reim']
+NOUN_WORD_TYPES = ['Substantiv'] * 8 + ['Toponym', 'Vorname', 'Nachname', 'Abkürzung']
+
+
+class SyntheticDump:
+    """Generates the pages of a synthetic German wiktionary xml."""
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.used_titles = set()
+
+    def stem(self, capitalized=True):
+        '''Returns a new random word that has not been used as a page title yet.'''
+        while True:
+            word = ''.join(self.random.choice(SYLLABLES) for _ in range(self.random.randint(2, 4)))
+            if capitalized:
+                word = word.capitalize()
+            if word not in self.used_titles:
+                self.used_titles.add(word)
+                return word
+
+    def translations(self, meanings: int) -> str:
+        '''Returns an English translation line (with the kind of mark-up that clean_up_string and the translation parsers have to deal with).'''
+        parts = []
+        for meaning in range(1, meanings + 1):
+            words = ['{{Ü|en|' + self.random.choice(ENGLISH_WORDS) + '}}' for _ in range(self.random.randint(1, 3))]
+            if self.random.random() < 0.3:
+                words[0] = '[[' + self.random.choice(ENGLISH_WORDS) + ']] ' + words[0]
+            if self.random.random() < 0.2:
+                words[-1] += '<ref>Quelle</ref>'
+            parts.append('[{0}] {1}'.format(meaning, ', '.join(words)))
+        return '*{{en}}: ' + '; '.join(parts)
+
+    def noun_table(self, word: str, genus: str) -> str:
+        '''Returns a noun declension table, with several declensions, starred and dialectal forms now and then.'''
+        plural = word + self.random.choice(['en', 'e', 'er', 's', 'n'])
+        table = ['{{Deutsch Substantiv Übersicht', '|Genus=' + genus]
+        for case, ending in [('Nominativ', ''), ('Genitiv', 's'), ('Dativ', ''), ('Akkusativ', '')]:
+            table.append('|{0} Singular={1}{2}'.format(case, word, ending))
+            if self.random.random() < 0.2:
+                table.append('|{0} Singular*={1}e{2}'.format(case, word, ending))
+            if self.random.random() < 0.3:
+                table.append('|{0} Plural 1={1}'.format(case, plural))
+                table.append('|{0} Plural 2={1}'.format(case, word + 'e'))
+            elif self.random.random() < 0.1:
+                table.append('|{0} Plural=de {1}'.format(case, plural))
+            else:
+                table.append('|{0} Plural={1}'.format(case, plural))
+        table.append('}}')
+        return '\n'.join(table)
+
+    def noun_page(self):
+        word = self.stem()
+        usages = []
+        for usage_no in range(self.random.choices([1, 2, 3], [70, 25, 5])[0]):
+            word_type = self.random.choice(NOUN_WORD_TYPES)
+            genus = self.random.choice(['m', 'f', 'n'])
+            usage = ['=== {{Wortart|' + word_type + '|Deutsch}}, {{' + genus + '}} ===', '']
+            if word_type != 'Abkürzung':
+                usage += [self.noun_table(word, genus), '']
+            usage += ['{{Worttrennung}}', ':' + word + ', {{Pl.}} ' + word + 'en', '', '{{Bedeutungen}}',
+                      ':[1] [[' + self.stem() + ']] <!-- Kommentar -->', ':[2] [[' + self.stem(False) + '|' + word + ']]', '',
+                      '==== {{Übersetzungen}} ====', '{{Ü-Tabelle|Ü-links=', self.translations(self.random.randint(1, 3)), '}}', '']
+            usages.append('\n'.join(usage))
+        return word, '== ' + word + ' ({{Sprache|Deutsch}}) ==\n' + '\n'.join(usages)
+
+    def adj_page(self):
+        word = self.stem(False)
+        table = ['{{Deutsch Adjektiv Übersicht', '|Positiv=' + word]
+        if self.random.random() < 0.15:
+            table += ['|Komparativ=—', '|Superlativ=—', '|am=nein', '|keine weiteren Formen=ja']
+        else:
+            if self.random.random() < 0.1:
+                table.append('|Komparativ*=' + word + 'rer')
+            table += ['|Komparativ=' + word + 'er', '|Superlativ=' + word + 'sten']
+        table.append('}}')
+        text = '\n'.join(['== ' + word + ' ({{Sprache|Deutsch}}) ==', '=== {{Wortart|Adjektiv|Deutsch}} ===', ''] + table +
+                         ['', '{{Worttrennung}}', ':' + word, '', '==== {{Übersetzungen}} ====', self.translations(self.random.randint(1, 2))])
+        return word, text
+
+    def other_german_page(self):
+        word = self.stem(False)
+        return word, '== ' + word + ' ({{Sprache|Deutsch}}) ==\n=== {{Wortart|Verb|Deutsch}} ===\n\n{{Worttrennung}}\n:' + word + '\n'
+
+    def non_german_page(self):
+        word = self.stem(False)
+        language = self.random.choice(OTHER_LANGUAGES)
+        return word, ('== ' + word + ' ({{Sprache|' + language + '}}) ==\n=== {{Wortart|Substantiv|' + language + '}} ===\n\n' +
+                      '{{Bedeutungen}}\n:[1] ' + ' '.join(self.random.choice(ENGLISH_WORDS) for _ in range(12)) + '\n')
+
+    def namensraum_page(self):
+        word = self.stem()
+        return self.random.choice(NAMESPACES) + ':' + word, 'Eine Seite über [[' + word + ']], nicht für die Deutsch-Wörterbücher.\n'
+
+    def pages(self, n_pages: int, mix: dict):
+        '''Yields (title, wikitext) pairs of n_pages pages, their types drawn according to the weights in mix.'''
+        page_types = list(mix)
+        weights = [mix[page_type] for page_type in page_types]
+        for _ in range(n_pages):
+            page_type = self.random.choices(page_types, weights)[0]
+            yield getattr(self, page_type + '_page')()
+
+    def write(self, file_path, n_pages: int, mix: dict = DEFAULT_MIX):
+        '''Writes an xml of n_pages synthetic pages to file_path.'''
+        with open(file_path, 'w', encoding='utf-8') as xml:
+            xml.write('<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10" xml:lang="de">\n'
+                      '  <siteinfo>\n    <sitename>Wiktionary</sitename>\n  </siteinfo>\n')
+            for page_id, (title, text) in enumerate(self.pages(n_pages, mix), 1):
+                xml.write('  <page>\n    <title>{0}</title>\n    <ns>0</ns>\n    <id>{1}</id>\n    <revision>\n      <id>{2}</id>\n'
+                          '      <model>wikitext</model>\n      <format>text/x-wiki</format>\n'
+                          '      <text xml:space="preserve">{3}</text>\n      <sha1>{4}</sha1>\n    </revision>\n  </page>\n'
+                          .format(escape(title), page_id, 1000000 + page_id, escape(text, {'"': '&quot;'}), hashlib.sha1(text.encode('utf-8')).hexdigest()))
+            xml.write('</mediawiki>\n')
+
+
+def parse_mix(mix_str: str) -> dict:
+    '''Parses a "noun=45,adj=15,..." string into a dictionary of page type weights.'''
+    mix = {}
+    for item in mix_str.split(','):
+        page_type, weight = item.split('=')
+        if page_type.strip() not in DEFAULT_MIX:
+            raise ValueError('Unknown page type: {0} (known types: {1}).'.format(page_type, ', '.join(DEFAULT_MIX)))
+        mix[page_type.strip()] = float(weight)
+    return mix
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Generates a synthetic German wiktionary xml file.')
+    arg_parser.add_argument('output', help='the path of the xml file to write')
+    arg_parser.add_argument('--pages', type=int, default=100000, help='the number of pages (default: 100000)')
+    arg_parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help='the weights of the page types (default: {0})'.format(
+        ','.join('{0}={1}'.format(page_type, weight) for page_type, weight in DEFAULT_MIX.items())))
+    arg_parser.add_argument('--seed', type=int, default=0, help='the seed of the random generator (default: 0)')
+    args = arg_parser.parse_args()
+    SyntheticDump(args.seed).write(args.output, args.pages, args.mix)
+    print('Wrote {0} pages to {1}.'.format(args.pages, args.output))
@@ -0,0 +1,171 @@
+#!python3
+# -*- coding: utf-8 -*-
+
+'''
+Golden-output regression check and differential harness for the parsers.
+
+corpus.xml is a small German wiktionary xml of representative pages (multi-declension, starred and dialectal noun forms,
+-sch and adjectival declension, tantum nouns, Abkürzung-only pages, a page beginning with a usage heading, nested templates and links in declension table cells, adjectives with am/keine weiteren Formen, mark-up to clean up,
+non-German and namespace pages), and the expected directory holds the dictionaries generated from it as json files.
+Usage:
+python check_regression.py                        compares the dictionaries generated by the package in ../src with the expected ones
+python check_regression.py --update               regenerates the expected json files (after an intended change of the output, which requires increasing
+                                                  the parser_version of the dictionary class: the versions are recorded in expected/parser_versions.json)
+python check_regression.py --baseline OLD_SRC     compares the dictionaries generated by the package in ../src with those of the package in OLD_SRC
+                                                  (e.g., the src directory of a git worktree of an earlier commit); use --xml to run both on a real dump
+The old and the new versions of the clean-up (clean_up_string_sequential and clean_up_string) are also compared on every page of the xml.
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REGRESSION_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(REGRESSION_DIR, '..', 'src')
+CORPUS_PATH = os.path.join(REGRESSION_DIR, 'corpus.xml')
+EXPECTED_DIR = os.path.join(REGRESSION_DIR, 'expected')
+EXPECTED_VERSIONS_PATH = os.path.join(EXPECTED_DIR, 'parser_versions.json')  # the parser_version of each dictionary class generating the expected output
+
+# The dictionaries checked: (name of the json file, dictionary class, generating method, keyword arguments)
+DICTIONARIES = [('noun_entries', 'GermanNounEntriesDict', 'generate_entries', {}),
+                ('adj_entries', 'GermanAdjEntriesDict', 'generate_entries', {}),
+                ('noun_translations', 'GermanNounTranslationDict', 'generate_translations', {}),
+                ('noun_translations_strict', 'GermanNounTranslationDict', 'generate_translations', {'strict': True}),
+                ('adj_translations', 'GermanAdjTranslationDict', 'generate_translations', {}),
+                ('adj_translations_strict', 'GermanAdjTranslationDict', 'generate_translations', {'strict': True})]
+
+
+def generate_results(src_dir, xml_path, out_path):
+    '''Generates all the dictionaries from xml_path with the package in src_dir (in a child process) and saves them in a json file at out_path.'''
+    subprocess.run([sys.executable, os.path.abspath(__file__), '--generate', src_dir, '--xml', xml_path, '--out', out_path],
+                   check=True, stdout=subprocess.DEVNULL)
+    with open(out_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _generate(src_dir, xml_path, out_path):
+    '''The child process of generate_results. Uses only the methods that all versions of the package have, so that any version can serve as a baseline.'''
+    sys.path.insert(0, os.path.abspath(src_dir))
+    import dewiktionaryparser as dw
+    results = {}
+    for name, class_name, method, kwargs in DICTIONARIES:
+        dic = getattr(dw, class_name)()
+        getattr(dic, method)(xml_path, **kwargs)
+        results[name] = dic
+    results['parser_versions'] = {class_name: getattr(getattr(dw, class_name), 'parser_version', None) for _, class_name, _, _ in DICTIONARIES}
+    with open(out_path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False)
+
+
+def diff_dictionaries(name, expected: dict, actual: dict) -> int:
+    '''Prints the differences between two versions of a dictionary. Returns the number of headwords that differ.'''
+    differences = 0
+    for headword in expected:
+        if headword not in actual:
+            print('{0}: missing {1!r}: {2}'.format(name, headword, expected[headword]))
+            differences += 1
+        elif expected[headword] != actual[headword]:
+            print('{0}: {1!r} differs:\n  expected: {2}\n  actual:   {3}'.format(name, headword, expected[headword], actual[headword]))
+            differences += 1
+    for headword in actual:
+        if headword not in expected:
+            print('{0}: unexpected {1!r}: {2}'.format(name, headword, actual[headword]))
+            differences += 1
+    if not differences and list(expected) != list(actual):
+        print('{0}: same entries in a different order'.format(name))
+        differences += 1
+    return differences
+
+
+def diff_clean_up(xml_path) -> int:
+    '''Compares clean_up_string with clean_up_string_sequential on the titles and the texts of the pages of the xml. Returns the number of pages on which they differ.'''
+    sys.path.insert(0, os.path.abspath(SRC_DIR))
+    import dewiktionaryparser as dw
+    if not hasattr(dw, 'clean_up_string_sequential'):
+        return 0
+    differences = 0
+    for page in dw.iter_wiki_pages(xml_path):
+        if dw.clean_up_string(page.title) != dw.clean_up_string_sequential(page.title) or dw.clean_up_string(page.text) != dw.clean_up_string_sequential(page.text):
+            print('clean_up_string: output differs from clean_up_string_sequential on page {0!r}'.format(page.title))
+            differences += 1
+    return differences
+
+
+def load_expected():
+    expected = {}
+    for name, _, _, _ in DICTIONARIES:
+        with open(os.path.join(EXPECTED_DIR, name + '.json'), 'r', encoding='utf-8') as file:
+            expected[name] = json.load(file)
+    return expected
+
+
+def save_expected(results):
+    for name, _, _, _ in DICTIONARIES:
+        with open(os.path.join(EXPECTED_DIR, name + '.json'), 'w', encoding='utf-8') as file:
+            json.dump(results[name], file, ensure_ascii=False, indent=1)
+            file.write('\n')
+    with open(EXPECTED_VERSIONS_PATH, 'w', encoding='utf-8') as file:
+        json.dump(results['parser_versions'], file, indent=1)
+        file.write('\n')
+
+
+def load_expected_versions() -> dict:
+    if not os.path.exists(EXPECTED_VERSIONS_PATH):
+        return {}
+    with open(EXPECTED_VERSIONS_PATH, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def unversioned_changes(expected: dict, actual: dict, expected_versions: dict) -> int:
+    '''Prints the dictionaries in which the entry of a headword of the expected output has changed although the parser_version of their class has not (so that
+    the results of the old parser would still be used from a ParseCache or in an incremental rebuild). Returns their number. (New or removed corpus pages are no such change.)'''
+    changes = 0
+    for name, class_name, _, _ in DICTIONARIES:
+        if actual['parser_versions'][class_name] != expected_versions.get(class_name):
+            continue
+        changed = [headword for headword in expected[name] if headword in actual[name] and expected[name][headword] != actual[name][headword]]
+        if changed:
+            print('{0}: the entries of {1} changed, but the parser_version of {2} is still {3}: increase it (see WordEntriesDict.parser_version).'.format(
+                name, ', '.join(map(repr, changed)), class_name, expected_versions[class_name]))
+            changes += 1
+    return changes
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Checks the output of the parsers against the expected output or against another version of the package.')
+    arg_parser.add_argument('--xml', default=CORPUS_PATH, help='the xml to parse (default: corpus.xml; the expected output is only defined for the corpus)')
+    arg_parser.add_argument('--baseline', help='the src directory of the version of the package to compare with (instead of the expected output)')
+    arg_parser.add_argument('--update', action='store_true', help='overwrite the expected output with the output of the package in ../src')
+    arg_parser.add_argument('--generate', help=argparse.SUPPRESS)
+    arg_parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.generate:
+        _generate(args.generate, args.xml, args.out)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        actual = generate_results(SRC_DIR, args.xml, os.path.join(temp_dir, 'actual.json'))
+        if args.update:
+            if unversioned_changes(load_expected(), actual, load_expected_versions()):
+                print('FAILED: expected output not updated.')
+                sys.exit(1)
+            save_expected(actual)
+            print('Expected output updated in {0}.'.format(EXPECTED_DIR))
+            sys.exit(0)
+        if args.baseline:
+            expected = generate_results(args.baseline, args.xml, os.path.join(temp_dir, 'baseline.json'))
+        else:
+            expected = load_expected()
+    differences = sum(diff_dictionaries(name, expected[name], actual[name]) for name, _, _, _ in DICTIONARIES)
+    differences += diff_clean_up(args.xml)
+    if not args.baseline and actual['parser_versions'] != load_expected_versions():
+        print('parser versions: {0}, expected {1} (update the expected output with --update)'.format(actual['parser_versions'], load_expected_versions()))
+        differences += 1
+    if differences:
+        print('FAILED: {0} differences.'.format(differences))
+        sys.exit(1)
+    print('OK: the output of all {0} dictionaries is identical{1}.'.format(len(DICTIONARIES), ' to the baseline' if args.baseline else ' to the expected output'))
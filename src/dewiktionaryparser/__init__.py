@@ -1,5 +1,13 @@
+from .instrumentation import *
 from .common_defs import *
+from .parse_cache import *
+from .binary_dict import *
+from .lazy_json_dict import *
+from .inverse_dict import *
+from .section_tree import *
+from .dump_parser import *
 from .de_wikt_noun_info_parser import *
+from .paradigm_table import *
 from .de_wikt_noun_translations import *
 from .de_wikt_adj_info_parser import *
 from .de_wikt_adj_translations import *
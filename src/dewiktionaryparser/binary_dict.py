@@ -0,0 +1,290 @@
+#!python3
+# -*- coding: utf-8 -*-
+
+from .common_defs import *
+from array import array
+import mmap
+import struct
+import sys
+
+# A compact binary file format for the dictionaries, for lookups without loading the (hundreds of MB of) dict and list objects of the json file:
+# every string of the dictionary (headwords, keys and leaves) is stored only once in a string table, and every entry is packed into
+# a few bytes per node referring to its strings by their number. MappedWordEntriesDict memory-maps the file and decodes an entry only when it is looked up,
+# so opening a dictionary costs next to nothing, and processes sharing the file (e.g., forked workers of a lookup service) share its pages.
+#
+# Layout of the file (the arrays are in the byte order recorded in the header, every section begins at a multiple of 8 bytes):
+#   header                 magic, format version, byte order, number of strings, number of entries, and the byte offsets of the following sections
+#   string offsets         array of number of strings + 1 uint32: the offsets of the utf-8 strings in the string data
+#   string data            the utf-8 encoded strings, concatenated
+#   headwords              array of number of entries uint32: the string numbers of the headwords, in the order of the dictionary
+#   sorted headwords       array of number of entries uint32: the entry numbers in the order of the utf-8 encoded headwords (for binary search)
+#   entry offsets          array of number of entries + 1 uint64: the offsets of the packed entries in the entry data
+#   entry data             the packed entries
+# An entry is packed as a tree of nodes, each beginning with a tag byte (NODE_...), followed by unsigned LEB128 varints:
+#   NODE_DICT n (key string number, node) * n;  NODE_STR_LIST n string number * n;  NODE_LIST n node * n;  NODE_STR string number;
+#   NODE_INT zigzag-encoded int;  NODE_FLOAT 8-byte little-endian double;  NODE_TRUE, NODE_FALSE, NODE_NONE.
+
+BINARY_DICT_MAGIC = b'DWKB'
+BINARY_DICT_VERSION = 1
+BINARY_DICT_HEADER = struct.Struct('<4sHBxIIQQQQQQ')
+
+NODE_DICT, NODE_STR_LIST, NODE_LIST, NODE_STR, NODE_INT, NODE_FLOAT, NODE_TRUE, NODE_FALSE, NODE_NONE = range(9)
+BYTE_ORDERS = {'little': 0, 'big': 1}
+
+
+#####################################
+#  Writing                          #
+#####################################
+
+def write_binary_dict(dic, file_path):
+    '''Writes the entries of dic (a mapping of headwords to json-compatible entries, e.g., a WordEntriesDict) to file_path in the binary format above.'''
+    write_binary_entries(dic.items(), file_path)
+
+
+def write_binary_entries(entries, file_path):
+    '''Writes (headword, entry) pairs, e.g., from a generator, to file_path in the binary format above (only their packed form is kept in memory). Returns the number of entries.'''
+    string_numbers = {}
+    headwords = array('I')
+    entry_offsets = array('Q', [0])
+    entry_data = bytearray()
+    for headword, entry in entries:
+        headwords.append(_string_number(headword, string_numbers))
+        _pack_node(entry, entry_data, string_numbers)
+        entry_offsets.append(len(entry_data))
+    strings = [string.encode('utf-8') for string in string_numbers]
+    string_offsets = array('I', [0])
+    for string in strings:
+        string_offsets.append(string_offsets[-1] + len(string))  # (raises OverflowError for more than 4 GB of strings)
+    sorted_headwords = array('I', sorted(range(len(headwords)), key=lambda entry_no: strings[headwords[entry_no]]))
+    sections = [string_offsets.tobytes(), b''.join(strings), headwords.tobytes(), sorted_headwords.tobytes(), entry_offsets.tobytes(), bytes(entry_data)]
+    offsets = []
+    position = BINARY_DICT_HEADER.size
+    for section in sections:
+        position += -position % 8
+        offsets.append(position)
+        position += len(section)
+    with open(file_path, 'wb') as file:
+        file.write(BINARY_DICT_HEADER.pack(BINARY_DICT_MAGIC, BINARY_DICT_VERSION, BYTE_ORDERS[sys.byteorder], len(strings), len(headwords), *offsets))
+        for offset, section in zip(offsets, sections):
+            file.write(b'\0' * (offset - file.tell()))
+            file.write(section)
+    return len(headwords)
+
+
+def _string_number(string, string_numbers: dict) -> int:
+    number = string_numbers.get(string)
+    if number is None:
+        number = string_numbers[string] = len(string_numbers)
+    return number
+
+
+def _pack_varint(n: int, data: bytearray):
+    while n > 0x7f:
+        data.append(n & 0x7f | 0x80)
+        n >>= 7
+    data.append(n)
+
+
+def _pack_node(value, data: bytearray, string_numbers: dict):
+    if isinstance(value, str):
+        data.append(NODE_STR)
+        _pack_varint(_string_number(value, string_numbers), data)
+    elif isinstance(value, dict):
+        data.append(NODE_DICT)
+        _pack_varint(len(value), data)
+        for key, subvalue in value.items():
+            if not isinstance(key, str):
+                raise TypeError('Only string keys can be exported to a binary dictionary, not {0!r}.'.format(key))
+            _pack_varint(_string_number(key, string_numbers), data)
+            _pack_node(subvalue, data, string_numbers)
+    elif isinstance(value, (list, tuple)):
+        if all(isinstance(item, str) for item in value):
+            data.append(NODE_STR_LIST)
+            _pack_varint(len(value), data)
+            for item in value:
+                _pack_varint(_string_number(item, string_numbers), data)
+        else:
+            data.append(NODE_LIST)
+            _pack_varint(len(value), data)
+            for item in value:
+                _pack_node(item, data, string_numbers)
+    elif value is True:
+        data.append(NODE_TRUE)
+    elif value is False:
+        data.append(NODE_FALSE)
+    elif value is None:
+        data.append(NODE_NONE)
+    elif isinstance(value, int):
+        data.append(NODE_INT)
+        _pack_varint(value * 2 if value >= 0 else -value * 2 - 1, data)
+    elif isinstance(value, float):
+        data.append(NODE_FLOAT)
+        data += struct.pack('<d', value)
+    else:
+        raise TypeError('Values of type {0} cannot be exported to a binary dictionary.'.format(type(value).__name__))
+
+
+#####################################
+#  Memory-mapped reading            #
+#####################################
+
+class MappedWordEntriesDict(ReadOnlyWordEntriesDict):
+    """A read-only dictionary of the entries in a binary file written by WordEntriesDict.export_to_binary. The file is memory-mapped, and an entry is only decoded when it is looked up."""
+
+    def __init__(self, file_path):
+        '''
+        :param file_path: the path of the binary dictionary file.
+        '''
+        self.file_path = file_path
+        with open(file_path, 'rb') as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byte_order, self.n_strings, self.n_entries, *offsets = BINARY_DICT_HEADER.unpack_from(self.mmap)
+        if magic != BINARY_DICT_MAGIC or version != BINARY_DICT_VERSION:
+            self.mmap.close()
+            raise ValueError('{0} is not a binary dictionary file of version {1}.'.format(file_path, BINARY_DICT_VERSION))
+        string_offsets, self.string_data, headwords, sorted_headwords, entry_offsets, self.entry_data = offsets
+        swap = byte_order != BYTE_ORDERS[sys.byteorder]
+        self.string_offsets = self._array('I', string_offsets, self.n_strings + 1, swap)
+        self.headwords = self._array('I', headwords, self.n_entries, swap)
+        self.sorted_headwords = self._array('I', sorted_headwords, self.n_entries, swap)
+        self.entry_offsets = self._array('Q', entry_offsets, self.n_entries + 1, swap)
+        self.strings = {}  # the strings decoded so far, by their number
+
+    def _array(self, typecode: str, offset: int, length: int, swap: bool):
+        '''Returns a view of an array section of the file (a copy, if it has to be converted into the byte order of the machine).'''
+        size = array(typecode).itemsize * length
+        if swap:
+            converted = array(typecode, self.mmap[offset:offset + size])
+            converted.byteswap()
+            return converted
+        return memoryview(self.mmap)[offset:offset + size].cast(typecode)
+
+    def string(self, number: int) -> str:
+        '''Returns the string of the string table with the given number.'''
+        string = self.strings.get(number)
+        if string is None:
+            begin = self.string_data + self.string_offsets[number]
+            string = self.strings[number] = str(self.mmap[begin:begin + self.string_offsets[number + 1] - self.string_offsets[number]], 'utf-8')
+        return string
+
+    def string_bytes(self, number: int) -> bytes:
+        begin = self.string_data + self.string_offsets[number]
+        return self.mmap[begin:begin + self.string_offsets[number + 1] - self.string_offsets[number]]
+
+    def entry_no(self, headword: str):
+        '''Returns the number of the entry of headword (by binary search in the sorted headwords), or None if there is none.'''
+        if not isinstance(headword, str):
+            return None
+        key = headword.encode('utf-8')
+        low, high = 0, self.n_entries
+        while low < high:
+            middle = (low + high) // 2
+            if self.string_bytes(self.headwords[self.sorted_headwords[middle]]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n_entries and self.string_bytes(self.headwords[self.sorted_headwords[low]]) == key:
+            return self.sorted_headwords[low]
+        return None
+
+    def entry(self, entry_no: int):
+        '''Decodes the entry with the given number.'''
+        begin = self.entry_data + self.entry_offsets[entry_no]
+        value, _ = self._unpack_node(self.mmap[begin:self.entry_data + self.entry_offsets[entry_no + 1]], 0)
+        return value
+
+    def _unpack_node(self, data: bytes, pos: int):
+        '''Decodes the node at data[pos], returns the value and the position after the node.
+        (The most frequent cases, one-byte varints and strings decoded before, are handled inline: this is where the time of a lookup goes.)'''
+        tag = data[pos]
+        if tag == NODE_FLOAT:
+            return struct.unpack_from('<d', data, pos + 1)[0], pos + 9
+        if tag > NODE_FLOAT:
+            return {NODE_TRUE: True, NODE_FALSE: False, NODE_NONE: None}[tag], pos + 1
+        n = data[pos + 1]
+        if n < 0x80:
+            pos += 2
+        else:
+            n, pos = _unpack_varint(data, pos + 1)
+        if tag == NODE_DICT:
+            value = {}
+            strings = self.strings
+            for _ in range(n):
+                key = data[pos]
+                if key < 0x80:
+                    pos += 1
+                else:
+                    key, pos = _unpack_varint(data, pos)
+                if data[pos] == NODE_STR_LIST and data[pos + 1] < 0x80:  # the leaves
+                    items = []
+                    pos += 2
+                    for _ in range(data[pos - 1]):
+                        number = data[pos]
+                        if number < 0x80:
+                            pos += 1
+                        else:
+                            number, pos = _unpack_varint(data, pos)
+                        items.append(strings.get(number) or self.string(number))
+                    value[strings.get(key) or self.string(key)] = items
+                else:
+                    value[strings.get(key) or self.string(key)], pos = self._unpack_node(data, pos)
+            return value, pos
+        if tag == NODE_STR_LIST:
+            value = []
+            for _ in range(n):
+                number, pos = _unpack_varint(data, pos)
+                value.append(self.string(number))
+            return value, pos
+        if tag == NODE_LIST:
+            value = []
+            for _ in range(n):
+                item, pos = self._unpack_node(data, pos)
+                value.append(item)
+            return value, pos
+        if tag == NODE_STR:
+            return self.string(n), pos
+        return (n >> 1) if not n & 1 else -(n >> 1) - 1, pos  # NODE_INT
+
+    def __getitem__(self, headword):
+        entry_no = self.entry_no(headword)
+        if entry_no is None:
+            raise KeyError(headword)
+        return self.entry(entry_no)
+
+    def __contains__(self, headword):
+        return self.entry_no(headword) is not None
+
+    def __iter__(self):
+        for number in self.headwords:
+            yield self.string(number)
+
+    def __len__(self):
+        return self.n_entries
+
+    def close(self):
+        '''Unmaps the file.'''
+        for view in (self.string_offsets, self.headwords, self.sorted_headwords, self.entry_offsets):
+            if isinstance(view, memoryview):
+                view.release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _unpack_varint(data: bytes, pos: int):
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    n = byte & 0x7f
+    shift = 7
+    while True:
+        pos += 1
+        byte = data[pos]
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos + 1
+        shift += 7
@@ -4,8 +4,12 @@
 import re
 import json
 import pprint
+import sys
+import ujson
 from collections import defaultdict
+from collections.abc import Mapping
 from prettytable import PrettyTable
+from .instrumentation import *
 
 ###################################
 #  Super-class for dictionaries   #
@@ -14,6 +18,22 @@ from prettytable import PrettyTable
 class WordEntriesDict(dict):
     """A generic dictionary entry"""
 
+    # Plain substrings at least one of which must occur in the raw (not yet cleaned-up) wikitext of a page for parse_page to find anything on it.
+    # Pages containing none of them are skipped by DumpParser before the costly clean-up (the empty tuple switches this pre-filter off).
+    prefilter_keywords = ()
+
+    # Part of the key of the cached parse_page results (see ParseCache) and of the parsers recorded for incremental rebuilds (see DumpParser.register): to be increased in a subclass
+    # in any commit changing its parse results (by a change of its parser, of the section tree or of clean_up_string), together with the expected output of the regression check.
+    parser_version = 1
+
+    # The names of the attributes that change the results of parse_page (e.g., 'strict'): only these are part of the ParseCache key and copied to the dictionaries parsing
+    # in the worker processes of DumpParser (other attributes, e.g., a query_index, are not, see parse_option_values).
+    parse_options = ()
+
+    # The default exclude and include lists of make_inv_dict (also used for the dictionary by write_inverse_dict).
+    inv_dict_exclude = []
+    inv_dict_include = []
+
     def export_to_json(self, file_path, encoding='utf-8'):
         '''
         For exporting nouns_info dictionary into json file.
@@ -22,30 +42,103 @@ class WordEntriesDict(dict):
         '''
         print('Exporting dictionary to {0} . . .'.format(file_path))
         with open(file_path, 'w', encoding=encoding) as file:
-            json.dump(self, file)
+            ujson.dump(self, file, escape_forward_slashes=False)
+        print('Dictionary exported.\n')
+
+
+    def export_to_jsonl(self, file_path, encoding='utf-8'):
+        '''
+        For exporting the dictionary into a JSON Lines file, with one entry (a {headword: entry} object) per line (see iter_jsonl_entries).
+        :param file_path: the file path to which the dictionary should be exported.
+        :param encoding: optional string argument specifying the file encoding (default: 'utf-8').
+        '''
+        print('Exporting dictionary to {0} . . .'.format(file_path))
+        with open(file_path, 'w', encoding=encoding) as file:
+            for headword, entry in self.items():
+                write_jsonl_entry(file, headword, entry)
         print('Dictionary exported.\n')
 
 
-    def retrieve_from_json(self, file_path, encoding='utf-8', clear_dict=True):
+    def export_to_binary(self, file_path):
+        '''
+        For exporting the dictionary into a compact binary file, which MappedWordEntriesDict can look entries up in without loading it.
+        :param file_path: the file path to which the dictionary should be exported.
+        '''
+        from .binary_dict import write_binary_dict
+        print('Exporting dictionary to {0} . . .'.format(file_path))
+        write_binary_dict(self, file_path)
+        print('Dictionary exported.\n')
+
+
+    def retrieve_from_json(self, file_path, encoding='utf-8', clear_dict=True, tuple_leaves=False):
         '''
         For retrieving previously generated json file contents to populate the dictionary.
+        The strings of the entries (keys and leaf elements alike) are interned, so that each distinct string is stored only once (see intern_entry).
         :param file_path: the json file path from which the info should be retrieved.
         :param encoding: optional string argument specifying the file encoding. Some possible encodings: 'utf-8' (default), 'ISO-8859-1'
         :param clear_dict: iff not false, existing entries in self will be deleted before populating self with json information (this is the default choice)
+        :param tuple_leaves: iff True, the leaves are stored as tuples, equal leaves being the same tuple, instead of lists. This takes even less memory, but the leaves cannot be changed in place
+        (e.g., by parsing more pages into the dictionary).
         '''
         if clear_dict:
             self.clear()
         print('Retrieving dictionary from {0} . . .'.format(file_path))
         try:
             with open(file_path, 'r', encoding=encoding) as file:
-                self.update(json.load(file))
+                # (json interns the entries object by object as it parses them: ujson would build all their strings first, whose memory would not be returned to the system)
+                self.update(json.load(file, object_pairs_hook=interning_hook({} if tuple_leaves else None)))
             print('Retrieved {0} entries.\n'.format(len(self)))
         except FileNotFoundError:
             print('FILE NOT FOUND! {0}\n'.format(file_path))
 
 
-    def make_inv_dict(self, exclude=list(), include=list()):
+    def retrieve_from_jsonl(self, file_path, encoding='utf-8', clear_dict=True, tuple_leaves=False):
+        '''
+        For retrieving the entries of a JSON Lines file (written by export_to_jsonl or by a streaming DumpParser) to populate the dictionary.
+        Entries of a headword on several lines are merged usage by usage (see merge_entry).
+        :param file_path: the JSON Lines file path from which the info should be retrieved.
+        :param encoding: optional string argument specifying the file encoding (default: 'utf-8').
+        :param clear_dict: iff not false, existing entries in self will be deleted before populating self with the file contents (this is the default choice)
+        :param tuple_leaves: iff True, the leaves are stored as tuples, equal leaves being the same tuple, instead of lists (see retrieve_from_json).
+        '''
+        if clear_dict:
+            self.clear()
+        print('Retrieving dictionary from {0} . . .'.format(file_path))
+        leaf_tuples = {} if tuple_leaves else None
+        try:
+            for headword, entry in iter_jsonl_entries(file_path, encoding):
+                self.merge_entry(headword, entry, leaf_tuples)
+            print('Retrieved {0} entries.\n'.format(len(self)))
+        except FileNotFoundError:
+            print('FILE NOT FOUND! {0}\n'.format(file_path))
+
+
+    def parse_page(self, page_title: str, one_page_str: str):
+        '''Parses the cleaned-up wikitext of a page into the dictionary, and returns True iff the page contained relevant information. Implemented by the subclasses that can be populated from a wiktionary xml file (see DumpParser).'''
+        raise NotImplementedError('{0} cannot be populated from a wiktionary xml file.'.format(type(self).__name__))
+
+
+    def parse_option_values(self) -> dict:
+        '''Returns the values of the parse_options of the dictionary by name.'''
+        return {name: getattr(self, name) for name in self.parse_options}
+
+    def parser_key(self) -> str:
+        '''Returns the string identifying the parser of the dictionary: its type, its parser_version and the values of its parse_options (see ParseCache and DumpParser.register).'''
+        return '{0}.{1} {2} {3}'.format(type(self).__module__, type(self).__qualname__, self.parser_version, sorted(self.parse_option_values().items()))
+
+    def merge_entry(self, headword: str, entry, leaf_tuples=None):
+        '''Adds an entry parsed separately (e.g., in a worker process or from the parse cache) to the dictionary, merging it usage by usage into the existing entry of headword, if any.
+        The strings of the entry are interned (see intern_entry, also for leaf_tuples).'''
+        entry = intern_entry(entry, leaf_tuples)
+        if headword in self and isinstance(self[headword], dict):
+            self[headword].update(entry)
+        else:
+            self[sys.intern(headword)] = entry
+
+
+    def make_inv_dict(self, exclude=inv_dict_exclude, include=inv_dict_include):
         '''Generates and returns an inverse dictionary (whose keys are elements of list-leaves of self, and whose values are word entries from self including that string as an element of its leaves) as a WordEntriesDict entity.
+        (For an inverse dictionary too big for the memory, see write_inverse_dict.)
         :param exclude: All branches containing any of the features in the exclude list are disregarded.
         :param include: Only leaves of branches containing at least one feature in the include list (if specified) are collected.'''
         try:
@@ -56,24 +149,30 @@ class WordEntriesDict(dict):
             return
         print('Generating entries for inverse dictionary . . .')
         inv_dict = defaultdict(set)
+        for leaf_element, w in self.inverse_pairs(exclude, include):
+            inv_dict[leaf_element].add(w)
+        print('Read {0} entries altogether.'.format(len(self)))
+        for entry in inv_dict:
+            inv_dict[entry] = list(inv_dict[entry])
+        print('Generated {0} new entries for inverse search.\n'.format(len(inv_dict)))
+        return WordEntriesDict(inv_dict)
+
+
+    def inverse_pairs(self, exclude=inv_dict_exclude, include=inv_dict_include):
+        '''Yields the (leaf element, headword) pairs of the inverse dictionary (see make_inv_dict for the arguments), headword by headword.'''
         for i, w in enumerate(self):
             if (i + 1) % 10000 == 0:
                 print('read', i + 1, 'entries')
-            for branch in branches(self[w]):
+            for path, leaf in iter_branches(self[w]):
                 if include:
-                    if all(feat not in branch[:-1] for feat in include):
+                    if all(feat not in path for feat in include):
                         continue
-                if all(feat not in branch[:-1] for feat in exclude):
-                    if isinstance(branch[-1], list):
-                        for leaf_element in branch[-1]:
-                            inv_dict[leaf_element].add(w)
+                if all(feat not in path for feat in exclude):
+                    if isinstance(leaf, (list, tuple)):
+                        for leaf_element in leaf:
+                            yield leaf_element, w
                     else:  # note: currently all leaves are lists, but else option kept for potential extensions
-                        inv_dict[branch[-1]].add(w)
-        print('Read {0} entries altogether.'.format(len(self)))
-        for entry in inv_dict:
-            inv_dict[entry] = list(inv_dict[entry])
-        print('Generated {0} new entries for inverse search.\n'.format(len(inv_dict)))
-        return WordEntriesDict(inv_dict)
+                        yield leaf, w
 
 
     def enhance_usages(self, second_dic: dict):
@@ -113,7 +212,7 @@ class WordEntriesDict(dict):
            ''' Displays a word entry in a tabulated form. Not to be used with inverse dictionaries. Requires the prettytable or the PTable package. The switch 'verbose' affects the details displayed (default: False). '''
            try:
                branchlist = branches(self[noun])
-               if isinstance(self[noun], list):
+               if isinstance(self[noun], (list, tuple)):
                    print('\n {0} |--> {1}'.format(noun, ', '.join(sorted(self[noun]))))
                    return
                elif any(feat in br for br in branchlist for feat in ['deg_of_comp', 'spec_comp', 'decl_feat', 'attr_pred']):
@@ -160,10 +259,71 @@ class WordEntriesDict(dict):
 
 
 
+class ReadOnlyWordEntriesDict(Mapping):
+    """Base class of the read-only views of an exported dictionary (e.g., MappedWordEntriesDict), which decode the entries from a file on access instead of loading them all.
+    The views support the read-only methods of WordEntriesDict (and of the functions in explore.py); WordEntriesDict(view) or, e.g., GermanNounEntriesDict(view) loads all the entries into memory.
+    (Every access returns a freshly decoded entry, so changing it does not change the view.)"""
+
+    inv_dict_exclude = WordEntriesDict.inv_dict_exclude
+    inv_dict_include = WordEntriesDict.inv_dict_include
+    make_inv_dict = WordEntriesDict.make_inv_dict
+    inverse_pairs = WordEntriesDict.inverse_pairs
+    printsorted = WordEntriesDict.printsorted
+    word_entry = WordEntriesDict.word_entry
+    tabulate_entry = WordEntriesDict.tabulate_entry
+
+    def export_to_json(self, file_path, encoding='utf-8'):
+        '''For exporting all the entries into a json file (see WordEntriesDict.export_to_json).'''
+        WordEntriesDict.export_to_json(WordEntriesDict(self), file_path, encoding)
+
+    def __repr__(self):
+        return '<{0} of {1} entries>'.format(type(self).__name__, len(self))
+
+
+def write_jsonl_entry(file, headword: str, entry):
+    '''Writes an entry to a JSON Lines file opened for writing, as a {headword: entry} object on a line of its own.'''
+    file.write(ujson.dumps({headword: entry}, ensure_ascii=False, escape_forward_slashes=False))
+    file.write('\n')
+
+
+def iter_jsonl_entries(file_path, encoding='utf-8'):
+    '''Yields the (headword, entry) pairs of a JSON Lines file written by WordEntriesDict.export_to_jsonl or by a streaming DumpParser, one line at a time.
+    (The same headword may occur on several lines, e.g., if pages with the same cleaned-up title were parsed separately; see WordEntriesDict.retrieve_from_jsonl.)'''
+    with open(file_path, 'r', encoding=encoding) as file:
+        for line in file:
+            if line.strip():
+                yield from ujson.loads(line).items()
+
+
 ############################################
 #  Dictionary manipulation functions       #
 ############################################
 
+def intern_entry(value, leaf_tuples=None):
+    '''Returns a copy of an entry (or of any json-compatible value) in which every string, key or leaf element, is interned (see sys.intern), so that equal strings
+    (e.g., the keys 'gen_case_num', 'nominativ', 'sg1', or leaf elements like 'f') are one and the same string object in all the entries.
+    :param leaf_tuples: if a dict is given, the lists of strings (the leaves) are turned into tuples, and equal leaves into one and the same tuple, which is kept in leaf_tuples.'''
+    if isinstance(value, dict):
+        return {sys.intern(key) if isinstance(key, str) else key: intern_entry(subvalue, leaf_tuples) for key, subvalue in value.items()}
+    if isinstance(value, (list, tuple)):
+        if not all(isinstance(item, str) for item in value):
+            return [intern_entry(item, leaf_tuples) for item in value]
+        if leaf_tuples is None:
+            return list(map(sys.intern, value))
+        leaf = tuple(map(sys.intern, value))
+        return leaf_tuples.setdefault(leaf, leaf)
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def interning_hook(leaf_tuples=None):
+    '''Returns an object_pairs_hook for json.load() that interns the strings of the objects as they are parsed, as intern_entry does (also for leaf_tuples).'''
+    def hook(pairs):
+        return {sys.intern(key): value if isinstance(value, dict) else intern_entry(value, leaf_tuples) for key, value in pairs}  # (the nested objects are interned already)
+    return hook
+
+
 def get_by_keypath(dic:dict, keypath:list):
     for key in keypath:
         dic = dic[key]
@@ -194,19 +354,88 @@ def nextlevel_keys(dic:dict, keypath:list):
         return None
 
 
-def branches(tree:dict, keypath=list()) -> list:
-    '''Unpacks a dictionary into a flat list of its branches '''
-    branches_list = []
-    if nextlevel_keys(tree, keypath) == None:
-        return [[get_by_keypath(tree,keypath)]]
-    else:
-        for k in nextlevel_keys(tree, keypath):
-            kth_br_list = []
-            for sub_tree_br_list in branches(tree, keypath + [k]):
-                kth_br_list.append([k] + sub_tree_br_list)
-            for br in kth_br_list:
-                branches_list.append(br)
-    return branches_list
+def iter_branches(tree:dict):
+    '''Yields the branches of a dictionary as (path, leaf) pairs, where path is the tuple of the keys leading to the leaf, depth first and in the order of the keys.
+    The walk is iterative (a stack of item iterators), and the path tuple of a nested dictionary is built only once for all its leaves.'''
+    if not isinstance(tree, Mapping):
+        yield (), tree
+        return
+    stack = [((), iter(tree.items()))]
+    while stack:
+        path, items = stack[-1]
+        for key, value in items:
+            if isinstance(value, dict):
+                stack.append((path + (key,), iter(value.items())))
+                break
+            yield path + (key,), value
+        else:
+            stack.pop()
+
+
+def branches(tree:dict, keypath=()) -> list:
+    '''Unpacks a dictionary (or its subdictionary under keypath) into a flat list of its branches, each a list of the keys followed by the leaf (see iter_branches).'''
+    return [[*path, leaf] for path, leaf in iter_branches(get_by_keypath(tree, keypath))]
+
+class UsageFeatureMatrix:
+    """A usage-level feature matrix of a dictionary: one row per (headword, usage) pair, in the order of the dictionary, and one bit column per key occurring in the usages
+    (a Python int used as a bitset, whose bit i is set if the key occurs, with a twig under it, in the usage of row i). Selecting the usages by include and exclude keys
+    takes a few big-int operations over all the rows at once, and the selected usages are shared with the dictionary instead of being copied (see subdictionary)."""
+
+    def __init__(self, dic):
+        '''
+        :param dic: the dictionary (a WordEntriesDict, or a read-only one). Entries that are not dictionaries of usages (e.g., of inverse dictionaries) have no rows.
+        '''
+        self.dic = dic
+        self.rows = []  # (headword, usage) pairs
+        rows_by_key = defaultdict(list)
+        for w in dic:
+            entry = dic[w]
+            if not isinstance(entry, Mapping):
+                continue
+            for u in entry:
+                row = len(self.rows)
+                self.rows.append((w, u))
+                for key in {key for path, _ in iter_branches(entry[u]) for key in path}:
+                    rows_by_key[key].append(row)
+        self.columns = {key: _bitset(rows, len(self.rows)) for key, rows in rows_by_key.items()}  # key -> bitset of the rows
+
+    def select(self, include_list=(), exclude_list=()) -> int:
+        '''Returns the bitset of the rows whose usages have all the keys in include_list but none in exclude_list.'''
+        mask = (1 << len(self.rows)) - 1
+        for key in include_list:
+            mask &= self.columns.get(key, 0)
+        for key in exclude_list:
+            mask &= ~self.columns.get(key, 0)
+        return mask
+
+    def selected_rows(self, mask: int):
+        '''Yields the (headword, usage) pairs of the rows in the bitset mask.'''
+        bits = bin(mask)[:1:-1]  # bit i is bits[i]
+        row = bits.find('1')
+        while row >= 0:
+            yield self.rows[row]
+            row = bits.find('1', row + 1)
+
+    def subdictionary(self, mask: int, dict_type=None, entry_type=dict, copy=False):
+        '''Returns the dictionary of the usages in the bitset mask, by headword.
+        :param dict_type: the type of the dictionary (default: WordEntriesDict). :param entry_type: the type of its entries (default: dict).
+        :param copy: if False (default), the usages are the very objects of the source dictionary (so changing them changes the source dictionary as well), otherwise they are deep copies.
+        '''
+        subdic = (WordEntriesDict if dict_type is None else dict_type)()
+        for w, u in self.selected_rows(mask):
+            entry = subdic.get(w)
+            if entry is None:
+                entry = subdic[w] = entry_type()
+            entry[u] = ujson.loads(ujson.dumps(self.dic[w][u])) if copy else self.dic[w][u]
+        return subdic
+
+
+def _bitset(positions: list, size: int) -> int:
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
 
 def partition_branches(branchlist):
     branchlist = preproc(branchlist)
@@ -248,6 +477,13 @@ ordering4 = ['sg1', 'sg2', 'sg3', 'sg4', 'pl1', 'pl2', 'pl3', 'pl4', '', ' ']
 namensraum_simple = r"(Spezial|Medium|Diskussion|Vorlage|Verzeichnis|Thesaurus|Reim|Flexion|Hilfe|Kategorie|Benutzer|Gadget|Gadget-Definition|Wiktionary|Datei|MediaWiki|Modul|Benutzerin|BD|WT|Bild|Image|WikiSaurus)"
 colon = r"\:"
 diskussion_colon = r" Diskussion:"
+namensraum_title_regex = re.compile(namensraum_simple + r"( Diskussion)?" + colon)
+
+
+def in_namensraum(page_title: str) -> bool:
+    '''Returns True iff page_title belongs to one of the wiktionary namespaces (pages under these are ignored by the parsers).'''
+    return namensraum_title_regex.match(page_title) is not None
+
 
 ''' strings to remove from xml to clean it before parsing: '''
 
@@ -276,7 +512,8 @@ specstring = re.compile("\&(amp)?;nbsp;") # e.g., "nothing&nbsp;of&nbsp;", repla
 quote_html = re.compile(r'&quot;')  # replace as ": string = re.sub(quote_html, '"', string)
 amp_html = re.compile(r'&amp;')  # replace as ": string = re.sub(amp_html, '&', string)
 
-def clean_up_string(string:str):
+def clean_up_string_sequential(string:str):
+    '''The reference clean-up: all the substitutions above, one pass over the whole string each (see clean_up_string).'''
     string = re.sub(wiki_link_string, r'\2', string)
     string = re.sub(specstring, ' ', string)
     string = re.sub(quote_html, '"', string)
@@ -286,6 +523,110 @@ def clean_up_string(string:str):
     return string
 
 
+# specstring, quote_html and amp_html in a single alternation (their matches all begin with the only '&' they contain, so one pass replaces exactly what the three passes do):
+html_entity_string = re.compile(r"\&(?:amp)?;nbsp;|&quot;|&amp;")
+html_entity_replacements = {'&quot;': '"', '&amp;': '&'}  # anything else matched is a (&amp;);nbsp; to replace with a space
+
+# Substrings without which the corresponding to_del_strings regex cannot match (its pass is skipped if none of them is in the string), but for unicode_char_to_del:
+to_del_strings_triggers = [('!--',), ('<comment',), ('nowiki',), ('<small', '<sup', '<ref', '&lt;small', '&lt;sup', '&lt;ref'), ('<small', '<sup', '<ref', '&lt;small', '&lt;sup', '&lt;ref')]
+unicode_chars_to_del_table = {ord('\u00AE'): None, ord('\u200e'): None}  # str.translate() version of unicode_char_to_del
+
+
+@timed_stage
+def clean_up_string(string:str):
+    '''Cleans up a (raw) wikitext string, with the same result as clean_up_string_sequential, but faster:
+    the three html entity substitutions are done in a single pass, and the passes of the other regexes are skipped unless the string contains a substring they need to match.
+    (The link and deletion passes are kept separate and in order, because their matches may overlap, e.g., a <ref> containing a comment containing a </ref>.)'''
+    if '[[' in string:
+        string = re.sub(wiki_link_string, r'\2', string)
+    if '&' in string:
+        string = re.sub(html_entity_string, lambda entity: html_entity_replacements.get(entity.group(), ' '), string)
+    for to_del_string, triggers in zip(to_del_strings, to_del_strings_triggers):
+        if any(trigger in string for trigger in triggers):
+            string = re.sub(to_del_string, '', string)
+    if '\u00AE' in string or '\u200e' in string:
+        string = string.translate(unicode_chars_to_del_table)
+    return string
+
+
+# The deletion regexes above are of the form OPENER(.(?!STOP))*.?CLOSER, which takes quadratic time on a line with many OPENERs and no CLOSER
+# (e.g., thousands of unclosed '<!--'). clean_up_string_safe deletes the same matches with delete_tempered(), which does not backtrack.
+# For each of the regexes (but unicode_char_to_del): the regex of its OPENER, and a function of an OPENER match returning the STOP strings and the CLOSER strings.
+to_del_strings_safe = [(re.compile(r"(<|&lt;)!--"), lambda opener: (('-->', '--&gt;'), ('-->', '--&gt;'))),
+                       (re.compile(r"<comment"), lambda opener: (('</comment>',), ('</comment>',))),
+                       (re.compile(r"(<|&lt;)nowiki(>|&gt;)"), lambda opener: (nowiki_tags, nowiki_tags)),
+                       (re.compile(r"(<|\&lt;)(small|sup|ref)"), lambda opener: ((opener.group(1) + '/' + opener.group(2),),
+                                                                                 (opener.group(1) + '/' + opener.group(2) + '>', opener.group(1) + '/' + opener.group(2) + '&gt;'))),
+                       (re.compile(r"(<|\&lt;)(small|sup|ref)"), lambda opener: (('>', '&gt;'), ('>', '&gt;')))]
+nowiki_tags = ('<nowiki>', '<nowiki&gt;', '&lt;nowiki>', '&lt;nowiki&gt;')
+
+
+def delete_tempered(string: str, opener_regex, delimiters) -> str:
+    '''Deletes the matches of a regex of the form OPENER(.(?!STOP))*.?CLOSER (each CLOSER beginning with a STOP) from string, with the same result as re.sub(), but in linear time.
+    The loop (.(?!STOP))* takes the characters up to the first one followed by a STOP (or up to the end of the line), so the match can only end with a CLOSER right after
+    that character, or else (with an empty loop) with a CLOSER right after the OPENER.
+    :param opener_regex: the compiled regex of OPENER.
+    :param delimiters: a function of an OPENER match, returning the tuple of the STOP strings and the tuple of the CLOSER strings.'''
+    pieces = []
+    kept = 0  # the beginning of the part of the string not copied to pieces yet
+    found = {}  # the first position found of each STOP string (and of the newline) after the last search; len(string) + 1 if there is none
+    pos = 0
+    while True:
+        opener = opener_regex.search(string, pos)
+        if opener is None:
+            break
+        stops, closers = delimiters(opener)
+        begin = opener.end()
+        loop_end = _find_from(string, '\n', begin, found)
+        for stop in stops:
+            loop_end = min(loop_end, _find_from(string, stop, begin + 1, found) - 1)
+        end = None
+        if loop_end < len(string) and string[loop_end] != '\n':
+            end = _closer_end(string, loop_end + 1, closers)
+        if end is None:
+            end = _closer_end(string, begin, closers)
+        if end is None:
+            pos = opener.start() + 1
+        else:
+            pieces.append(string[kept:opener.start()])
+            kept = pos = end
+    pieces.append(string[kept:])
+    return ''.join(pieces)
+
+
+def _find_from(string: str, sub: str, start: int, found: dict) -> int:
+    position = found.get(sub, -1)
+    if position < start:  # (the positions searched from only grow, so a position found earlier is still the first one if it is not before start)
+        position = string.find(sub, start)
+        if position == -1:
+            position = len(string) + 1
+        found[sub] = position
+    return position
+
+
+def _closer_end(string: str, position: int, closers: tuple):
+    for closer in closers:
+        if string.startswith(closer, position):
+            return position + len(closer)
+    return None
+
+
+@timed_stage
+def clean_up_string_safe(string:str):
+    '''Cleans up a (raw) wikitext string with the same result as clean_up_string, but deleting the comments, nowiki and html tags with delete_tempered() instead of the regexes:
+    slower on ordinary pages, but in linear time on any page (see the page_time_budget of DumpParser).'''
+    if '[[' in string:
+        string = re.sub(wiki_link_string, r'\2', string)
+    if '&' in string:
+        string = re.sub(html_entity_string, lambda entity: html_entity_replacements.get(entity.group(), ' '), string)
+    for (opener_regex, delimiters), triggers in zip(to_del_strings_safe, to_del_strings_triggers):
+        if any(trigger in string for trigger in triggers):
+            string = delete_tempered(string, opener_regex, delimiters)
+    if '\u00AE' in string or '\u200e' in string:
+        string = string.translate(unicode_chars_to_del_table)
+    return string
+
+
 ########################
 # Major-level regexes  #
 ########################
@@ -308,8 +649,17 @@ text_end_pattern = re.compile(r"</text>")
 ##   POS-specific definitions    ##
 ###################################
 
-de_noun_regex = re.compile(r"([^=]|^|\n)=== \{\{Wortart\|(Substantiv|Abkürzung|Toponym|Nachname|Vorname|Eigenname|Name|Buchstabe|Zahlklassifikator|Straßenname)\|Deutsch\}\}")
-de_adj_regex = re.compile(r"([^=]|^|\n)=== \{\{Wortart\|Adjektiv\|Deutsch\}\}")
+WORTARTEN_NOUN = ['Substantiv', 'Abkürzung', 'Toponym', 'Nachname', 'Vorname', 'Eigenname', 'Name', 'Buchstabe', 'Zahlklassifikator', 'Straßenname']
+WORTARTEN_ADJ = ['Adjektiv']
+
+de_noun_regex = re.compile(r"([^=]|^|\n)=== \{\{Wortart\|(" + '|'.join(WORTARTEN_NOUN) + r")\|Deutsch\}\}")
+de_adj_regex = re.compile(r"([^=]|^|\n)=== \{\{Wortart\|(" + '|'.join(WORTARTEN_ADJ) + r")\|Deutsch\}\}")
+
+# The prefilter_keywords of the noun and of the adjective dictionaries (see WordEntriesDict.prefilter_keywords): the "Wortart|...|Deutsch" of the headings
+# that de_noun_regex and de_adj_regex look for, which clean_up_string does not bring about. (The bare Wortart names would let through almost every page:
+# 'Name' and 'Substantiv' occur on most of them, e.g., in 'Namen', 'Vorname' or "vom Substantiv" in the Herkunft section.)
+PREFILTER_KEYWORDS_NOUN = tuple('Wortart|{0}|Deutsch'.format(wortart) for wortart in WORTARTEN_NOUN)
+PREFILTER_KEYWORDS_ADJ = tuple('Wortart|{0}|Deutsch'.format(wortart) for wortart in WORTARTEN_ADJ)
 
 
 ########################################
@@ -2,12 +2,19 @@
 # -*- coding: utf-8 -*-
 
 from .common_defs import *
+from .dump_parser import DumpParser
+from .section_tree import section_tree, UsageSection, parse_template, template_value_text
 
 
 class GermanAdjEntriesDict(WordEntriesDict):
     """Dictionary for storing morphological information about German nouns from the German wiktionary."""
 
-    def make_inv_dict(self, exclude=list(), include=list({'positiv', 'komparativ', 'superlativ'})):
+    prefilter_keywords = PREFILTER_KEYWORDS_ADJ  # see WordEntriesDict.prefilter_keywords
+    parser_version = 2  # see WordEntriesDict.parser_version (2: the declension tables are parsed with parse_template)
+    inv_dict_exclude = []  # the defaults of make_inv_dict, see WordEntriesDict.inv_dict_exclude
+    inv_dict_include = ['positiv', 'komparativ', 'superlativ']
+
+    def make_inv_dict(self, exclude=inv_dict_exclude, include=inv_dict_include):
         '''Returns an inverse dictionary containing by default degrees of comparison forms as keys.'''
         inv_dict = super().make_inv_dict(exclude=exclude, include=include)
         return WordEntriesDict(inv_dict)
@@ -16,12 +23,28 @@ class GermanAdjEntriesDict(WordEntriesDict):
     #    Methods for parsing wiktionary xml.   #
     ############################################
 
-    def full_info(self, decl_table: str):
-        '''Returns a list of ('MORPH_pattern_regex', [('STARRED', 'VALUE'), ]) tuples for morphological pattern regexes in the regexes dictionary.'''
-        return [(reg, re.findall(regexes_adj_dic[reg], decl_table)) for reg in regexes_adj_dic]
-
+    def full_info(self, decl_table):
+        '''Returns a list of ('MORPH_pattern_regex', [('STARRED', 'VALUE'), ]) tuples for morphological pattern regexes in the regexes dictionary.
+        :param decl_table: the TemplateInvocation of the inflection table (see parse_template).'''
+        info = {reg: [] for reg in regexes_adj_dic}
+        # the (attribute, star) of the parameter keys, with their values (without nested templates and links, see template_value_text, and only their first lines: the rest of a cell is not part of the form) sorted by attribute:
+        for key, value in decl_table.params:
+            key_groups = decl_table_adj_keys.get(key)
+            if key_groups is None:  # a key not seen before
+                key_match = decl_table_adj_key_regex.fullmatch(key)
+                key_groups = decl_table_adj_keys[key] = key_match.groups('') if key_match else ()
+            if key_groups:
+                feat_name, starred = key_groups
+                info[regex_names_adj[feat_name]].append((starred, template_value_text(value).split('\n', 1)[0]))
+        for reg, matches in info.items():
+            count_matches(reg, matches)
+        return list(info.items())
+
+    @timed_stage
     def parse_decl_table(self, decl_table):
-        '''Parses a declension table (a multi-line string) and returns a dictionary of grammatical information ready for inclusion as value of the usage number key.'''
+        '''Parses a declension table (its TemplateInvocation, see parse_template, or the multi-line string of its parameters) and returns a dictionary of grammatical information ready for inclusion as value of the usage number key.'''
+        if isinstance(decl_table, str):
+            decl_table = parse_template('{{' + decl_table + '}}')
         wd = {}
         info = self.full_info(decl_table)
         to_add_starred = ()  # (keyseq, str) tuple for starred versions appearing before non-starred versions
@@ -62,15 +85,19 @@ class GermanAdjEntriesDict(WordEntriesDict):
                     to_add_starred = (keyseq, value_to_add)
         return wd
 
-    def parse_usage(self, adj_form: str, usage_index: str, usage: str):
-        '''Parses a word usage string and populates the dictionary with the relevant grammatical information.'''
+    @timed_stage
+    def parse_usage(self, adj_form: str, usage_index: str, usage):
+        '''Parses a word usage (a UsageSection of the section tree of the page, or a usage string) and populates the dictionary with the relevant grammatical information.'''
+        if isinstance(usage, str):
+            usage = UsageSection(usage_index, usage)
 
         ###############################################################################################
         # First, retrieve grammatical information from "Übersicht" (declension) table, if available. #
         ###############################################################################################
-        uebersicht = re.search(uebersicht_adj_regex, usage)
+        uebersicht = usage.search(uebersicht_adj_regex, usage.first_template('Deutsch Adjektiv Übersicht', prefix=True))
+        count_matches('uebersicht_adj_regex', uebersicht)
         if uebersicht:
-            decl_table = uebersicht.group(1)
+            decl_table = parse_template(usage.text, uebersicht.start())
             try:
                 set_by_keypath(self, [adj_form, usage_index], self.parse_decl_table(decl_table))
                 for twig in twig_collector(self[adj_form][usage_index]):
@@ -87,14 +114,15 @@ class GermanAdjEntriesDict(WordEntriesDict):
         # Checking for positive form-only adjectives #
         ##############################################
 
-        keine_steigerung_match = re.search(keine_steigerung_pattern, usage)
+        keine_steigerung_match = usage.search(keine_steigerung_pattern, usage.first_template('Worttrennung'))
         if keine_steigerung_match:
             set_by_keypath(self, [adj_form, usage_index, 'decl_feat'], ['no_comp'])
 
         ##############################################
         # Checking for positive form-only adjectives #
         ##############################################
-        adj_decl_match = re.search(adj_no_decl_pattern, usage)
+        adjektiv = usage.first_wortart(WORTARTEN_ADJ)
+        adj_decl_match = usage.search(adj_no_decl_pattern, adjektiv, lead=1)
         if adj_decl_match:
             try:
                 get_by_keypath(self, [adj_form, usage_index, 'decl_feat'])
@@ -107,7 +135,7 @@ class GermanAdjEntriesDict(WordEntriesDict):
         # Checking for attributive/predicative-only adjectives #
         ########################################################
 
-        adj_only_attr_match = re.search(adj_only_attr_pattern, usage)
+        adj_only_attr_match = usage.search(adj_only_attr_pattern, adjektiv, lead=1)
         if adj_only_attr_match:
             try:
                 get_by_keypath(self, [adj_form, usage_index, 'attr_pred'])
@@ -116,7 +144,7 @@ class GermanAdjEntriesDict(WordEntriesDict):
                 attr_pred = ['attr_only']
             set_by_keypath(self, [adj_form, usage_index, 'attr_pred'], attr_pred)
 
-        adj_only_pred_match = re.search(adj_only_pred_pattern, usage)
+        adj_only_pred_match = usage.search(adj_only_pred_pattern, adjektiv, lead=1)
         if adj_only_pred_match:
             try:
                 get_by_keypath(self, [adj_form, usage_index, 'attr_pred'])
@@ -126,86 +154,46 @@ class GermanAdjEntriesDict(WordEntriesDict):
             set_by_keypath(self, [adj_form, usage_index, 'attr_pred'], attr_pred)
 
 
-    def parse_word_page(self, adj_form: str, page_list: list):
+    @timed_stage
+    def parse_word_page(self, adj_form: str, one_page_str: str):
         '''Parses a word page from the xml file, separates it into usages and calls the usage parser function on each usage.'''
-        not_german_word = False  # variable to keep track of non-German word entries (==) within a page.
-        usages = []
-        usage = []
-        for line in page_list:
-            usage_begin_match = re.search(new_usage_pattern, line)
-            new_heading_two_matches = re.search(new_heading_two_regex, line)
-            if new_heading_two_matches:
-                if new_heading_two_matches.group('lang') == 'Deutsch':
-                    not_german_word = False
-                else:
-                    not_german_word = True
-            if not_german_word == False:
-                if usage_begin_match:
-                    if usage:
-                        usages.append(usage)
-                    usage = []
-                    usage.append(line)
-                else:
-                    usage.append(line)
-        usages.append(usage)  # because no "new_usage_pattern" at the end of the page, we need this after the for-cycle to add the last usage to the usages list.
-        usages.pop(0)
-        for usage in usages:
+        for usage in section_tree(one_page_str).usages:
             # we do not want to include usages that are not German adjectives:
-            if not re.search(de_adj_regex, '\n'.join(usage)):
+            if not usage.has_wortart(WORTARTEN_ADJ):
                 continue
-            usage_index = "u" + str(usages.index(usage) + 1)  # so usage numbering starts from 1, not 0
-            self.parse_usage(adj_form, usage_index, '\n'.join(usage))
-
-
-    def generate_entries(self, file_path):
-        '''Populates dictionary with noun information from the German wiktionary xml at file_path.'''
-        with open(file_path, 'r', encoding='utf-8') as wikif:
-            page_list = []
-            page_no = 0
-            print('Generating dictionary with adjectival information from wiktionary source: {0}\nThis may take several minutes . . .'.format(file_path))
-            for line in wikif:
-                page_list.append(line)
-                if '</page>' in line:
-                    page_no += 1
-                    if page_no % 50000 == 0:
-                        print(page_no, 'pages processed')
-
-                    one_page_str = ''.join(page_list)
-                    # ## Cleaning up page before parsing:
-                    one_page_str = clean_up_string(one_page_str)
-
-                    page_list = one_page_str.splitlines()
-
-                    # we are only interested in pages which contain German adjectival information
-                    if re.search(de_adj_regex, one_page_str) is None:
-                        page_list = []
-                        continue
-
-                    word_match = re.search(de_headword_spaces_allowed_regex, one_page_str)
-                    if word_match:
-                        title_match = re.search(title_pattern, one_page_str)
-                        if title_match:
-                            adj_form = title_match.group('pagetitle')
-                            ## Ignore pages under wiktionary-namespaces:
-                            if re.match(namensraum_simple + colon, adj_form) or re.match(namensraum_simple + diskussion_colon, adj_form):
-                                page_list = []
-                                continue
-                        else:
-                            page_list = []
-                            continue
-                    else:
-                        page_list = []
-                        continue
-                    # call the next lower level parser function on a page with German noun info:
-                    self.parse_word_page(adj_form, page_list)
-                    # delete entries with no usages (can happen if Abkürzung-only info in page)
-                    try:
-                        if not self[adj_form]:
-                            del self[adj_form]
-                    except KeyError:
-                        pass
-                    page_list = []
-            print('Read {0} pages.'.format(page_no))
+            self.parse_usage(adj_form, usage.index, usage)
+
+
+    @timed_stage
+    def parse_page(self, adj_form: str, one_page_str: str):
+        '''Parses the cleaned-up wikitext of a page titled adj_form if it contains German adjectival information. Returns True iff it does.'''
+        # we are only interested in pages which contain German adjectival information
+        if not section_tree(one_page_str).has_wortart(WORTARTEN_ADJ):
+            return False
+        if re.search(de_headword_spaces_allowed_regex, one_page_str) is None:
+            return False
+        # call the next lower level parser function on a page with German adjectival information:
+        self.parse_word_page(adj_form, one_page_str)
+        # delete entries with no usages (can happen if Abkürzung-only info in page)
+        try:
+            if not self[adj_form]:
+                del self[adj_form]
+        except KeyError:
+            pass
+        return True
+
+
+    def generate_entries(self, file_path, workers=1, decompression_workers=1, previous=None, revisions_path=None, cache_path=None, report_path=None,
+                         page_time_budget=None, retry_time_budget=None, quarantine_path=None, stream_path=None):
+        '''Populates dictionary with adjectival information from the German wiktionary xml (or .xml.bz2, .xml.gz dump) at file_path (parsing the pages in workers processes if workers > 1, see DumpParser).
+        For an incremental rebuild, pass the dictionary generated from the previous xml as previous, together with the revisions_path sidecar written by that run (see DumpParser).
+        With cache_path, the parse results are looked up in (and added to) a ParseCache database at that path. With report_path, a json report of the statistics of the run is exported to that path (see Instrumentation).
+        With page_time_budget (in seconds), pages taking longer are skipped and logged to quarantine_path (after a retry with the safe clean-up within retry_time_budget, if given; see DumpParser).
+        With stream_path, the entries are written to a JSON Lines file at that path as soon as they are parsed, instead of being kept in the dictionary (see retrieve_from_jsonl).'''
+        print('Generating dictionary with adjectival information from wiktionary source: {0}\nThis may take several minutes . . .'.format(file_path))
+        DumpParser(file_path, workers=workers, decompression_workers=decompression_workers, revisions_path=revisions_path, cache_path=cache_path, report_path=report_path,
+                   page_time_budget=page_time_budget, retry_time_budget=retry_time_budget, quarantine_path=quarantine_path).register(self, previous=[previous], stream_paths=[stream_path]).run()
+        if stream_path is None:
             print('Generated {0} entries.'.format(len(self)))
 
 
@@ -224,6 +212,11 @@ regexes_adj_dic = {}
 for pattern in patterns_adj_dic:
     regexes_adj_dic[pattern + '_regex'] = re.compile(patterns_adj_dic[pattern])
 
+# The parameter keys of an inflection table matched by the above regexes (their values are parsed by parse_template), e.g., 'Komparativ*': ('ATTRIBUTE', 'STARRED')
+decl_table_adj_key_regex = re.compile(r"({0}) *(\*)?\**".format('|'.join(MORPH_ATTRS_ADJ)))
+decl_table_adj_keys = {}  # the groups of decl_table_adj_key_regex by the keys parsed so far (() if it does not match)
+regex_names_adj = {feat_name: feat_name.lower().replace(' ', '_') + '_pattern_regex' for feat_name in MORPH_ATTRS_ADJ}
+
 keymaps_adj = {reg_name: [re.sub('_pattern_regex', '', reg_name)] for reg_name in regexes_adj_dic}
 
 ###########################################
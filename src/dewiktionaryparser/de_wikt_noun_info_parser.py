@@ -2,40 +2,64 @@
 # -*- coding: utf-8 -*-
 
 from .common_defs import *
+from .dump_parser import DumpParser
+from .section_tree import section_tree, UsageSection, parse_template, template_value_text
 import ujson
 
 
 class GermanNounEntriesDict(WordEntriesDict):
     """Dictionary for storing morphological information about German nouns from the German wiktionary."""
 
-    def make_inv_dict(self, exclude=list({'genus'}), include=list({'gen_case_num'})):
+    prefilter_keywords = PREFILTER_KEYWORDS_NOUN  # see WordEntriesDict.prefilter_keywords
+    parser_version = 2  # see WordEntriesDict.parser_version (2: the declension tables are parsed with parse_template)
+    inv_dict_exclude = ['genus']  # the defaults of make_inv_dict, see WordEntriesDict.inv_dict_exclude
+    inv_dict_include = ['gen_case_num']
+
+    def make_inv_dict(self, exclude=inv_dict_exclude, include=inv_dict_include):
         '''Returns an inverse dictionary containing by default (with exclude=list({'genus'}), include=list({'gen_case_num'})) only declined forms as keys.'''
         inv_dict = super().make_inv_dict(exclude=exclude, include=include)
         return WordEntriesDict(inv_dict)
 
-    def make_commons_dict(self):
-        '''Generates a subdictionary which doesn't have entries with the key 'spec_word_type' '''
+    def make_commons_dict(self, copy=False, matrix=None):
+        '''Generates a subdictionary which doesn't have entries with the key 'spec_word_type'.
+        :param copy: if False (default), the usages of the subdictionary are shared with self (see UsageFeatureMatrix.subdictionary), otherwise they are deep copies.
+        :param matrix: the UsageFeatureMatrix of self, if it has already been built (e.g., for deriving several subdictionaries).'''
         print('Generating entries for the common-nouns-only dictionary . . .')
-        copy_dic = GermanNounEntriesDict(ujson.loads(ujson.dumps(self)))
-        orig_size = len(copy_dic)
-        for w in self:
-            for u in self[w]:
-                if self[w][u].__contains__('spec_word_type'):
-                    del copy_dic[w][u]
-            if not copy_dic[w]:
-                del copy_dic[w]
-        new_size = len(copy_dic)
-        print('Generated {0} entries (excluded {1} special words).'.format(new_size, orig_size - new_size))
-        return copy_dic
+        if matrix is None:
+            matrix = UsageFeatureMatrix(self)
+        commons = matrix.subdictionary(matrix.select(exclude_list=['spec_word_type']), dict_type=GermanNounEntriesDict, copy=copy)
+        print('Generated {0} entries (excluded {1} special words).'.format(len(commons), len(self) - len(commons)))
+        return commons
+
+    def make_paradigm_table(self):
+        '''Returns the declension information of self as a NounParadigmTable, a columnar table with a row per declension of a usage (convert it back with its to_entries method).'''
+        from .paradigm_table import NounParadigmTable
+        print('Generating the paradigm table . . .')
+        table = NounParadigmTable(self)
+        print('Generated {0} rows ({1} distinct strings, {2} distinct cells).'.format(len(table), len(table.strings), len(table.cells) - 1))
+        return table
 
 
     ############################################
     #    Methods for parsing wiktionary xml.   #
     ############################################
 
-    def full_info(self, decl_table: str):
-        '''Returns a list of ('MORPH_pattern_regex', ['DECL_NUM', 'STARRED', 'VALUE']) tuples for morphological pattern regexes in the regexes dictionary.'''
-        return [(reg, re.findall(regexes_noun_dic[reg], decl_table)) for reg in regexes_noun_dic]
+    def full_info(self, decl_table):
+        '''Returns a list of ('MORPH_pattern_regex', ['DECL_NUM', 'STARRED', 'VALUE']) tuples for morphological pattern regexes in the regexes dictionary.
+        :param decl_table: the TemplateInvocation of the declension table (see parse_template).'''
+        info = {reg: [] for reg in regexes_noun_dic}
+        # the (attribute, decl. number, star) of the parameter keys, with their values (without nested templates and links, see template_value_text, and only their first lines: the rest of a cell is not part of the form) sorted by attribute:
+        for key, value in decl_table.params:
+            key_groups = decl_table_noun_keys.get(key)
+            if key_groups is None:  # a key not seen before
+                key_match = decl_table_noun_key_regex.fullmatch(key)
+                key_groups = decl_table_noun_keys[key] = key_match.groups('') if key_match else ()
+            if key_groups:
+                feat_name, decl_num, starred = key_groups
+                info[regex_names_noun[feat_name]].append((decl_num, starred, template_value_text(value).split('\n', 1)[0]))
+        for reg, matches in info.items():
+            count_matches(reg, matches)
+        return list(info.items())
         ## Sample output:
         # [('genus_pattern_regex', [('', '', 'f')]), ('nominativ_singular_pattern_regex', [('', '', 'Mutter')]), ('nominativ_plural_pattern_regex', [('1',
         # '', 'Mütter'), ('2', '', 'Muttern')]), ('genitiv_singular_pattern_regex', [('', '', 'Mutter')]), ('genitiv_plural_pattern_regex', [('1', '',
@@ -43,8 +67,11 @@ class GermanNounEntriesDict(WordEntriesDict):
         # ('2', '', 'Muttern')]), ('akkusativ_singular_pattern_regex', [('', '', 'Mutter')]), ('akkusativ_plural_pattern_regex', [('1', '', 'Mütter'),
         # ('2', '', 'Muttern')])]
 
+    @timed_stage
     def parse_decl_table(self, decl_table):
-        '''Parses a declension table (a multi-line string) and returns a dictionary of grammatical information ready for inclusion as value of the usage number key.'''
+        '''Parses a declension table (its TemplateInvocation, see parse_template, or the multi-line string of its parameters) and returns a dictionary of grammatical information ready for inclusion as value of the usage number key.'''
+        if isinstance(decl_table, str):
+            decl_table = parse_template('{{' + decl_table + '}}')
         wd = {}
         info = self.full_info(decl_table)
         to_add_starred = ()  # (keyseq, str) tuple for starred versions appearing before non-starred versions
@@ -118,15 +145,20 @@ class GermanNounEntriesDict(WordEntriesDict):
                         to_add_starred_pre = (keyseq_pre, value_prefix)
         return wd
 
-    def parse_usage(self, noun_form: str, usage_index: str, usage: str):
-        '''Parses a word usage string and populates the dictionary with the relevant grammatical information.'''
+    @timed_stage
+    def parse_usage(self, noun_form: str, usage_index: str, usage):
+        '''Parses a word usage (a UsageSection of the section tree of the page, or a usage string) and populates the dictionary with the relevant grammatical information.'''
+        if isinstance(usage, str):
+            usage = UsageSection(usage_index, usage)
+        usage_str = usage.text
 
         ###############################################################################################
         # First, retrieve grammatical information from "Übersicht" (declension) table, if available. #
         ###############################################################################################
-        uebersicht = re.search(uebersicht_noun_regex, usage)
+        uebersicht = usage.search(uebersicht_noun_regex, usage.first_template('Deutsch ', prefix=True))
+        count_matches('uebersicht_noun_regex', uebersicht)
         if uebersicht:
-            decl_table = uebersicht.group(2)
+            decl_table = parse_template(usage.text, uebersicht.start())
             try:
                 set_by_keypath(self, [noun_form, usage_index], self.parse_decl_table(decl_table))
                 for twig in twig_collector(self[noun_form][usage_index]):
@@ -145,7 +177,7 @@ class GermanNounEntriesDict(WordEntriesDict):
         try:
             if get_by_keypath(self, [noun_form, usage_index, 'gen_case_num', 'genus', 'sg1']) == ['0']:
                 set_by_keypath(self, [noun_form, usage_index, 'gen_case_num', 'genus', 'sg1'], [])
-                new_usage_line_match = re.search(new_usage_line, usage)
+                new_usage_line_match = re.search(new_usage_line, usage_str)
                 usage_line = new_usage_line_match.group(0)
                 self.gender_from_heading(noun_form, usage_index, usage_line)
         except KeyError:
@@ -153,7 +185,7 @@ class GermanNounEntriesDict(WordEntriesDict):
                 if get_by_keypath(self, [noun_form, usage_index, 'gen_case_num', 'genus']):
                     pass
             except KeyError:
-                new_usage_line_match = re.search(new_usage_line, usage)
+                new_usage_line_match = re.search(new_usage_line, usage_str)
                 usage_line = new_usage_line_match.group(0)
                 self.gender_from_heading(noun_form, usage_index, usage_line)
 
@@ -162,17 +194,19 @@ class GermanNounEntriesDict(WordEntriesDict):
         ############################################################
 
         ## -sch declension nouns like "Deutsch":
-        uebersicht_sch = re.search(uebersicht_sch_regex, usage)
+        uebersicht_sch = usage.search(uebersicht_sch_regex, usage.first_template('Deutsch Substantiv Übersicht', prefix=True))
+        count_matches('uebersicht_sch_regex', uebersicht_sch)
         if uebersicht_sch:
             set_by_keypath(self, [noun_form, usage_index, 'decl_type'], ['-sch'])
 
         ## adjectival declension nouns like "Erwachsene":
-        uebersicht_adj = re.search(uebersicht_adjektivisch_regex, usage)
+        uebersicht_adj = usage.search(uebersicht_adjektivisch_regex, usage.first_template('Deutsch adjektivisch Übersicht', prefix=True))
+        count_matches('uebersicht_adjektivisch_regex', uebersicht_adj)
         if uebersicht_adj:
             set_by_keypath(self, [noun_form, usage_index, 'decl_type'], ['adj'])
 
         else:
-            adj_decl_match = re.search(adj_decl_pattern, usage)
+            adj_decl_match = usage.search(adj_decl_pattern, usage.first_wortart(['Substantiv']), lead=1)
             if adj_decl_match:
                 set_by_keypath(self, [noun_form, usage_index, 'decl_type'], ['adj'])
 
@@ -196,7 +230,7 @@ class GermanNounEntriesDict(WordEntriesDict):
         #   Singular/plural tantum information  #
         #########################################
 
-        sg_pl_tantum_match = re.search(sg_pl_tantum_pattern, usage)
+        sg_pl_tantum_match = usage.search(sg_pl_tantum_pattern, usage.first_template('Worttrennung'))
         if sg_pl_tantum_match:
             # Note: "kPl." ("kein Plural") means it's a Sg tantum noun.
             if sg_pl_tantum_match.group('tantum') == 'Pl':
@@ -208,7 +242,7 @@ class GermanNounEntriesDict(WordEntriesDict):
         #  special feature information    #
         ###################################
 
-        spec_feature_match = re.findall(spec_feature_pattern, usage)
+        spec_feature_match = re.findall(spec_feature_pattern, usage_str)
         if spec_feature_match:
             set_by_keypath(self, [noun_form, usage_index, 'spec_word_type'], [])
             for spec_feat in spec_feature_match:
@@ -241,86 +275,47 @@ class GermanNounEntriesDict(WordEntriesDict):
                         set_by_keypath(self, keyseq, to_add)
 
 
-    def parse_word_page(self, noun_form: str, page_list: list):
+    @timed_stage
+    def parse_word_page(self, noun_form: str, one_page_str: str):
         '''Parses a word page from the xml file, separates it into usages and calls the usage parser function on each usage.'''
-        not_german_word = False  # variable to keep track of non-German word entries (==) within a page.
-        usages = []
-        usage = []
-        for line in page_list:
-            usage_begin_match = re.search(new_usage_pattern, line)
-            new_heading_two_matches = re.search(new_heading_two_regex, line)
-            if new_heading_two_matches:
-                if new_heading_two_matches.group('lang') == 'Deutsch':
-                    not_german_word = False
-                else:
-                    not_german_word = True
-            if not_german_word == False:
-                if usage_begin_match:
-                    if usage:
-                        usages.append(usage)
-                    usage = []
-                    usage.append(line)
-                else:
-                    usage.append(line)
-        usages.append(usage)  # because no "new_usage_pattern" at the end of the page, we need this after the for-cycle to add the last usage to the usages list.
-        usages.pop(0)
-        for usage in usages:
+        for usage in section_tree(one_page_str).usages:
             # we do not want to include usages that are not German nouns (e.g., the Interjektion for 'Alter'):
-            if not re.search(de_noun_regex, '\n'.join(usage)):
+            if not usage.has_wortart(WORTARTEN_NOUN):
                 continue
-            usage_index = "u" + str(usages.index(usage) + 1)  # so usage numbering starts from 1, not 0
-            self.parse_usage(noun_form, usage_index, '\n'.join(usage))
-
-
-    def generate_entries(self, file_path):
-        '''Populates dictionary with noun information from the German wiktionary xml at file_path.'''
-        with open(file_path, 'r', encoding='utf-8') as wikif:
-            page_list = []
-            page_no = 0
-            print('Generating dictionary with noun information from wiktionary source: {0}\nThis may take several minutes . . .'.format(file_path))
-            for line in wikif:
-                page_list.append(line)
-                if '</page>' in line:
-                    page_no += 1
-                    if page_no % 50000 == 0:
-                        print(page_no, 'pages processed')
-
-                    one_page_str = ''.join(page_list)
-                    # ## Cleaning up page before parsing:
-                    one_page_str = clean_up_string(one_page_str)
-
-                    page_list = one_page_str.splitlines()
-
-                    # we are only interested in pages which contain German noun info
-                    if re.search(de_noun_regex, one_page_str) is None:
-                        page_list = []
-                        continue
-
-                    word_match = re.search(de_headword_regex, one_page_str)
-                    if word_match:
-                        title_match = re.search(title_pattern, one_page_str)
-                        if title_match:
-                            noun_form = title_match.group('pagetitle')
-                            ## Ignore pages under wiktionary-namespaces:
-                            if re.match(namensraum_simple + colon, noun_form) or re.match(namensraum_simple + diskussion_colon, noun_form):
-                                page_list = []
-                                continue
-                        else:
-                            page_list = []
-                            continue
-                    else:
-                        page_list = []
-                        continue
-                    # call the next lower level parser function on a page with German noun info:
-                    self.parse_word_page(noun_form, page_list)
-                    # delete entries with no usages (can happen if Abkürzung-only info in page)
-                    try:
-                        if not self[noun_form]:
-                            del self[noun_form]
-                    except KeyError:
-                        pass
-                    page_list = []
-            print('Read {0} pages.'.format(page_no))
+            self.parse_usage(noun_form, usage.index, usage)
+
+
+    @timed_stage
+    def parse_page(self, noun_form: str, one_page_str: str):
+        '''Parses the cleaned-up wikitext of a page titled noun_form if it contains German noun info. Returns True iff it does.'''
+        # we are only interested in pages which contain German noun info
+        tree = section_tree(one_page_str)
+        if not tree.has_wortart(WORTARTEN_NOUN):
+            return False
+        if not tree.has_german_heading():
+            return False
+        # call the next lower level parser function on a page with German noun info:
+        self.parse_word_page(noun_form, one_page_str)
+        # delete entries with no usages (can happen if Abkürzung-only info in page)
+        try:
+            if not self[noun_form]:
+                del self[noun_form]
+        except KeyError:
+            pass
+        return True
+
+
+    def generate_entries(self, file_path, workers=1, decompression_workers=1, previous=None, revisions_path=None, cache_path=None, report_path=None,
+                         page_time_budget=None, retry_time_budget=None, quarantine_path=None, stream_path=None):
+        '''Populates dictionary with noun information from the German wiktionary xml (or .xml.bz2, .xml.gz dump) at file_path (parsing the pages in workers processes if workers > 1, see DumpParser).
+        For an incremental rebuild, pass the dictionary generated from the previous xml as previous, together with the revisions_path sidecar written by that run (see DumpParser).
+        With cache_path, the parse results are looked up in (and added to) a ParseCache database at that path. With report_path, a json report of the statistics of the run is exported to that path (see Instrumentation).
+        With page_time_budget (in seconds), pages taking longer are skipped and logged to quarantine_path (after a retry with the safe clean-up within retry_time_budget, if given; see DumpParser).
+        With stream_path, the entries are written to a JSON Lines file at that path as soon as they are parsed, instead of being kept in the dictionary (see retrieve_from_jsonl).'''
+        print('Generating dictionary with noun information from wiktionary source: {0}\nThis may take several minutes . . .'.format(file_path))
+        DumpParser(file_path, workers=workers, decompression_workers=decompression_workers, revisions_path=revisions_path, cache_path=cache_path, report_path=report_path,
+                   page_time_budget=page_time_budget, retry_time_budget=retry_time_budget, quarantine_path=quarantine_path).register(self, previous=[previous], stream_paths=[stream_path]).run()
+        if stream_path is None:
             print('Generated {0} entries.'.format(len(self)))
 
 
@@ -354,6 +349,11 @@ for pattern in patterns_noun_dic:
 # 'dativ_plural_pattern_regex': re.compile('\\|Dativ Plural ?(\\d)?(\\*)?=(\\w+|—)'), 'akkusativ_singular_pattern_regex': re.compile('\\|Akkusativ
 # Singular ?(\\d)?(\\*)?=(\\w+|—)'), 'akkusativ_plural_pattern_regex': re.compile('\\|Akkusativ Plural ?(\\d)?(\\*)?=(\\w+|—)')}
 
+# The parameter keys of a declension table matched by the above regexes (their values are parsed by parse_template), e.g., 'Nominativ Plural 2*': ('ATTRIBUTE', 'DECL_NUM', 'STARRED')
+decl_table_noun_key_regex = re.compile(r"({0}) ?(\d)? *(\*)?\**".format('|'.join(MORPH_ATTRS_NOUN)))
+decl_table_noun_keys = {}  # the groups of decl_table_noun_key_regex by the keys parsed so far (() if it does not match)
+regex_names_noun = {feat_name: feat_name.lower().replace(' ', '_') + '_pattern_regex' for feat_name in MORPH_ATTRS_NOUN}
+
 keymaps_noun = {reg_name: reg_name.split('_')[:-2] for reg_name in regexes_noun_dic}
 # {'genus_pattern_regex': ['genus'], 'nominativ_singular_pattern_regex': ['nominativ', 'singular'], 'nominativ_plural_pattern_regex': ['nominativ',
 # 'plural'], 'genitiv_singular_pattern_regex': ['genitiv', 'singular'], 'genitiv_plural_pattern_regex': ['genitiv', 'plural'],
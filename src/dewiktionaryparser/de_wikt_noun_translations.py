@@ -2,6 +2,8 @@
 # -*- coding: utf-8 -*-
 
 from .common_defs import *
+from .dump_parser import DumpParser
+from .section_tree import section_tree, UsageSection
 
 # This script creates a dictionary of (currently only English) translations of German nouns and abbreviations.
 # Note: no filtering for Abbreviation-only entries, so the translations contain entries like "usw." ('etc.').
@@ -15,95 +17,67 @@ https://de.wiktionary.org/wiki/Hilfe:Ü-Vorlagen
 
 class GermanNounTranslationDict(WordEntriesDict):
 
-    def make_inv_dict(self, exclude=list(), include=list({'translations'})):
+    prefilter_keywords = PREFILTER_KEYWORDS_NOUN  # see WordEntriesDict.prefilter_keywords
+    parser_version = 2  # see WordEntriesDict.parser_version (2: the first usage of a page beginning with a usage heading is kept)
+    strict = False  # iff True, parse_page uses the strict (non-greedy) translation heuristic; set by generate_translations
+    parse_options = ('strict',)  # see WordEntriesDict.parse_options
+    inv_dict_exclude = []  # the defaults of make_inv_dict, see WordEntriesDict.inv_dict_exclude
+    inv_dict_include = ['translations']
+
+    def make_inv_dict(self, exclude=inv_dict_exclude, include=inv_dict_include):
         '''Returns an inverse dictionary containing by default (with exclude=list(), include=list({'translations'})) only translations as keys.'''
         inv_dict = super().make_inv_dict(exclude=exclude, include=include)
         return WordEntriesDict(inv_dict)
 
-    def generate_translations(self, file_path, encoding='utf-8', strict=False):
-        '''Populates self with translations generated from German wiktionary xml file.'''
-        with open(file_path, 'r', encoding=encoding) as wikif:
-            page_list = []
-            page_no = 0
-            print('Generating noun translations from wiktionary source: {0}\nThis may take several minutes . . .'.format(file_path))
-            for line in wikif:
-                page_list.append(line)
-                if '</page>' in line:
-                    page_no += 1
-                    if page_no % 50000 == 0:
-                        print(page_no, 'pages processed')
-
-                    one_page_str = ''.join(page_list)
-                    ## Cleaning up page before parsing:
-                    one_page_str = clean_up_string(one_page_str)
-
-                    page_list = one_page_str.splitlines()
-
-                    if re.search(de_noun_regex, one_page_str) is None:
-                        page_list = []
-                        continue
-
-                    word_match = re.search(de_headword_regex, one_page_str)
-                    if word_match:
-                        title_match = re.search(title_pattern, one_page_str)
-                        if title_match:
-                            noun_form = title_match.group('pagetitle')
-                            ## Ignore pages under wiktionary-namespaces:
-                            if re.match(namensraum_simple + colon, noun_form) or re.match(namensraum_simple + diskussion_colon, noun_form):
-                                page_list = []
-                                continue
-                        else:
-                            page_list = []
-                            continue
-                    else:
-                        page_list = []
-                        continue
-                    self.parse_word_page_transl(page_list, noun_form, strict)
-                    try:
-                        if not self[noun_form]:
-                            del self[noun_form]
-                    except KeyError:
-                        pass
-                    page_list = []
-            print('\nRead {0} pages.'.format(page_no))
+    @timed_stage
+    def parse_page(self, noun_form: str, one_page_str: str):
+        '''Parses the translations on the cleaned-up wikitext of a page titled noun_form, using the strict or greedy heuristic as set by the strict attribute. Returns True iff the page contains German noun information.'''
+        tree = section_tree(one_page_str)
+        if not tree.has_wortart(WORTARTEN_NOUN):
+            return False
+        if not tree.has_german_heading():
+            return False
+        self.parse_word_page_transl(one_page_str, noun_form, self.strict)
+        try:
+            if not self[noun_form]:
+                del self[noun_form]
+        except KeyError:
+            pass
+        return True
+
+    def generate_translations(self, file_path, encoding='utf-8', strict=False, workers=1, decompression_workers=1, previous=None, revisions_path=None, cache_path=None, report_path=None,
+                              page_time_budget=None, retry_time_budget=None, quarantine_path=None, stream_path=None):
+        '''Populates self with translations generated from German wiktionary xml file (or .xml.bz2, .xml.gz dump), parsing the pages in workers processes if workers > 1 (see DumpParser).
+        For an incremental rebuild, pass the dictionary generated from the previous xml as previous, together with the revisions_path sidecar written by that run (see DumpParser).
+        With cache_path, the parse results are looked up in (and added to) a ParseCache database at that path. With report_path, a json report of the statistics of the run is exported to that path (see Instrumentation).
+        With page_time_budget (in seconds), pages taking longer are skipped and logged to quarantine_path (after a retry with the safe clean-up within retry_time_budget, if given; see DumpParser).
+        With stream_path, the entries are written to a JSON Lines file at that path as soon as they are parsed, instead of being kept in the dictionary (see retrieve_from_jsonl).'''
+        self.strict = strict
+        print('Generating noun translations from wiktionary source: {0}\nThis may take several minutes . . .'.format(file_path))
+        DumpParser(file_path, encoding=encoding, workers=workers, decompression_workers=decompression_workers, revisions_path=revisions_path, cache_path=cache_path, report_path=report_path,
+                   page_time_budget=page_time_budget, retry_time_budget=retry_time_budget, quarantine_path=quarantine_path).register(self, previous=[previous], stream_paths=[stream_path]).run()
+        if stream_path is None:
             print('Generated {0} entries.'.format(len(self)))
 
-    def parse_word_page_transl(self, page_list: list, noun_form: str, strict=False):
+    @timed_stage
+    def parse_word_page_transl(self, one_page_str: str, noun_form: str, strict=False):
         '''Parses a German word page (between <page> .. </page> tags) from the xml file, separates it into usages and calls the usage parser function on each usage.'''
-        not_german_word = False
-        usages = []
-        usage = []
-        for line in page_list:
-            usage_begin_match = re.search(new_usage_pattern, line)
-            new_heading_two_matches = re.search(new_heading_two_regex, line)
-            if new_heading_two_matches:
-                if new_heading_two_matches.group('lang') == 'Deutsch':
-                    not_german_word = False
-                else:
-                    not_german_word = True
-            if not_german_word == False:
-                if usage_begin_match:
-                    if usage:
-                        usages.append(usage)
-                    usage = []
-                    usage.append(line)
-                else:
-                    usage.append(line)
-        usages.append(usage)  # because no "new_usage_pattern" at the end of the page, we need this after the for-cycle to add the last usage to the usages list.
-        usages.pop(0)
-        for usage in usages:
+        for usage in section_tree(one_page_str).usages:
             # we do not want to include usages that are not German nouns (e.g., the Interjektion for 'Alter'):
-            if not re.search(de_noun_regex, '\n'.join(usage)):
+            if not usage.has_wortart(WORTARTEN_NOUN):
                 continue
-            usage_index = "u" + str(usages.index(usage) + 1)  # so usage numbering starts from 1, not 0
             if strict:
-                self.parse_usage_for_en_translation_strict('\n'.join(usage), usage_index, noun_form)
+                self.parse_usage_for_en_translation_strict(usage, usage.index, noun_form)
             else:
-                self.parse_usage_for_en_translation_greedy('\n'.join(usage), usage_index, noun_form)
+                self.parse_usage_for_en_translation_greedy(usage, usage.index, noun_form)
 
-    def parse_usage_for_en_translation_strict(self, usage: str, usage_index: str, noun_form: str):
+    @timed_stage
+    def parse_usage_for_en_translation_strict(self, usage, usage_index: str, noun_form: str):
         '''Parses a word usage (level 3 heading in wiktioanry) for translations of the German noun. Uses a strict heuristic, only collecting information from the translation tags (e.g., "[[insect]] {{Ü|en|colony}}" will be entered as "colony").'''
-        transl_en_line_match = re.search(transl_en_line_regex, usage)
+        if isinstance(usage, str):
+            usage = UsageSection(usage_index, usage)
+        transl_en_line_match = usage.search(transl_en_line_regex, usage.first_template('en'), lead=1)
+        count_matches('transl_en_line_regex', transl_en_line_match)
         if transl_en_line_match:
             transl_en_line = transl_en_line_match.group(0)
             # Example: "*{{en}}: [1] {{Ü|en|cock}}, {{Ü|en|rooster}}; [2] {{Ü|en|cock}}; [4] {{Ü|en|tap}}, {{Ü|en|valve}}; [5] {{Ü|en|hammer}}"
@@ -147,9 +121,13 @@ class GermanNounTranslationDict(WordEntriesDict):
                                 to_add = lexeme_translations
                             set_by_keypath(self, [noun_form, usage_index, 'translations', 'en', lexeme], to_add)
 
-    def parse_usage_for_en_translation_greedy(self, usage: str, usage_index: str, noun_form: str):
+    @timed_stage
+    def parse_usage_for_en_translation_greedy(self, usage, usage_index: str, noun_form: str):
         '''Parses a word usage (level 3 heading in wiktioanry) for translations of the German noun. Uses a looser, more greedy heuristic, and collects information from before the translation tags (e.g., "[[insect]] {{Ü|en|colony}}" will be entered as "insect colony")'''
-        transl_en_line_match = re.search(transl_en_line_regex, usage)
+        if isinstance(usage, str):
+            usage = UsageSection(usage_index, usage)
+        transl_en_line_match = usage.search(transl_en_line_regex, usage.first_template('en'), lead=1)
+        count_matches('transl_en_line_regex', transl_en_line_match)
         if transl_en_line_match:
             transl_en_line = transl_en_line_match.group(0)
             # Example: "*{{en}}: [1] {{Ü|en|cock}}, {{Ü|en|rooster}}; [2] {{Ü|en|cock}}; [4] {{Ü|en|tap}}, {{Ü|en|valve}}; [5] {{Ü|en|hammer}}"
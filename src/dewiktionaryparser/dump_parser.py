@@ -0,0 +1,625 @@
+#!python3
+# -*- coding: utf-8 -*-
+
+from .common_defs import *
+from .parse_cache import *
+from .instrumentation import *
+from collections import Counter, deque, namedtuple
+import contextlib
+import multiprocessing
+import bz2
+import gzip
+import json
+import os
+import signal
+import threading
+import time
+
+# The page-level driver shared by all the parsers: the wikitext of each page is read and cleaned up only once, and every page
+# is then handed over (as one string) to each registered dictionary via its parse_page() method; the parsers share its section tree (see section_tree).
+# This way a single pass over the (multi-GB) xml file can populate the noun, adjective and translation dictionaries at the same time.
+
+
+#####################################
+#  Streaming wiktionary xml reader  #
+#####################################
+
+WikiPage = namedtuple('WikiPage', ['title', 'text', 'offset', 'length', 'page_id', 'revision_id', 'sha1'])
+# title: the raw (xml-escaped) page title; text: the raw (xml-escaped) wikitext between the <text> tags;
+# offset, length: the byte offset and the byte length of the <page> .. </page> block in the (decompressed) xml;
+# page_id, revision_id, sha1: the page <id>, and the <id> and <sha1> of its (current) <revision>, as strings.
+
+REVISIONS_PARSERS_KEY = 'parsers'  # the key of the parser keys of the dictionaries in a revisions sidecar (the other keys are page ids, see DumpParser.register)
+
+READ_BUFFER_SIZE = 16 * 1024 * 1024
+BZ2_SEGMENT_SIZE = 4 * 1024 * 1024  # approximate size of the compressed bz2 data decompressed by one worker at a time
+
+
+def iter_wiki_pages(file_path, encoding='utf-8', buffer_size=READ_BUFFER_SIZE, decompression_workers=1, index_path=None):
+    '''Yields a WikiPage for every <page> .. </page> block of a wiktionary xml file (which may also be a .xml.bz2 or .xml.gz compressed dump).
+    The file is read in large binary blocks, and only the title and the text of the pages are decoded (no line-by-line reading and joining).
+    For the arguments decompression_workers and index_path, see iter_dump_blocks.'''
+    buffer = b''
+    buffer_offset = 0  # byte offset of buffer[0] in the xml
+    for block in iter_dump_blocks(file_path, buffer_size, decompression_workers, index_path):
+        buffer = buffer + block if buffer else block
+        pos = 0
+        while True:
+            page_begin = buffer.find(b'<page>', pos)
+            if page_begin == -1:
+                pos = max(pos, len(buffer) - len(b'<page>') + 1)  # keep a possibly incomplete '<page>' at the end of the buffer
+                break
+            page_end = buffer.find(b'</page>', page_begin)
+            if page_end == -1:
+                pos = page_begin
+                break
+            page_end += len(b'</page>')
+            yield page_from_slice(buffer, page_begin, page_end, buffer_offset, encoding)
+            pos = page_end
+        buffer = buffer[pos:]
+        buffer_offset += pos
+
+
+def open_wiki_dump(file_path):
+    '''Opens a wiktionary xml file for binary reading, decompressing it on the fly if its name ends in .bz2 or .gz.'''
+    if file_path.endswith('.bz2'):
+        return bz2.open(file_path, 'rb')
+    elif file_path.endswith('.gz'):
+        return gzip.open(file_path, 'rb')
+    return open(file_path, 'rb')
+
+
+def iter_dump_blocks(file_path, buffer_size=READ_BUFFER_SIZE, decompression_workers=1, index_path=None):
+    '''Yields the (decompressed) content of a wiktionary xml file in consecutive binary blocks.
+    A multistream .bz2 dump (e.g., dewiktionary-20180601-pages-articles-multistream.xml.bz2, made up of many independent bz2 streams) is
+    decompressed by decompression_workers processes (if decompression_workers > 1). The stream offsets are taken from the multistream index file
+    at index_path (by default, the ...-multistream-index.txt.bz2 file next to the dump is used if it exists), or else found by scanning the file for bz2 stream headers.
+    A single-stream .bz2 and a .gz file can only be decompressed serially.'''
+    if decompression_workers > 1 and file_path.endswith('.bz2'):
+        offsets = bz2_stream_offsets(file_path, index_path)
+        if len(offsets) > 2:
+            yield from iter_bz2_parallel(file_path, offsets, decompression_workers)
+            return
+    with open_wiki_dump(file_path) as wikif:
+        while True:
+            block = wikif.read(buffer_size)
+            if not block:
+                break
+            yield block
+
+
+def bz2_stream_offsets(file_path, index_path=None) -> list:
+    '''Returns the sorted list of the byte offsets of the bz2 streams in file_path, followed by the size of the file.'''
+    if index_path is None and file_path.endswith('.xml.bz2'):
+        default_index_path = file_path[:-len('.xml.bz2')] + '-index.txt.bz2'
+        if os.path.exists(default_index_path):
+            index_path = default_index_path
+    offsets = {0, os.path.getsize(file_path)}
+    if index_path is not None:
+        # lines of the multistream index: <stream offset>:<page id>:<page title>
+        with open_wiki_dump(index_path) as indexf:
+            for line in indexf:
+                offsets.add(int(line.split(b':', 1)[0]))
+    else:
+        offsets.update(scan_bz2_stream_headers(file_path))
+    return sorted(offsets)
+
+
+bz2_stream_header_regex = re.compile(rb"BZh[1-9]1AY&SY")  # stream header ('BZh' + block size) followed by the (byte-aligned) magic number of the first block
+
+
+def scan_bz2_stream_headers(file_path, buffer_size=READ_BUFFER_SIZE):
+    '''Yields the byte offsets at which a bz2 stream begins in file_path.'''
+    with open(file_path, 'rb') as bz2f:
+        tail = b''  # the end of the previous block, for headers spanning two blocks (too short to contain a whole header itself)
+        tail_offset = 0  # byte offset of tail[0] in the file
+        while True:
+            block = bz2f.read(buffer_size)
+            if not block:
+                break
+            buffer = tail + block
+            for match in bz2_stream_header_regex.finditer(buffer):
+                yield tail_offset + match.start()
+            tail = buffer[-len('BZh91AY&SY') + 1:]
+            tail_offset += len(buffer) - len(tail)
+
+
+def iter_bz2_parallel(file_path, offsets: list, workers: int):
+    '''Yields the decompressed content of the multistream bz2 file_path in order, decompressing groups of consecutive streams (delimited by offsets) in a pool of worker processes.'''
+    segments = []
+    begin = offsets[0]
+    for offset in offsets[1:]:
+        if offset - begin >= BZ2_SEGMENT_SIZE or offset == offsets[-1]:
+            segments.append((file_path, begin, offset))
+            begin = offset
+    pending = deque()
+    with multiprocessing.Pool(workers) as pool:
+        for segment in segments:
+            pending.append(pool.apply_async(_decompress_bz2_segment, (segment,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def _decompress_bz2_segment(segment):
+    '''Worker function of iter_bz2_parallel: decompresses the bz2 streams between two byte offsets of a file.'''
+    file_path, begin, end = segment
+    with open(file_path, 'rb') as bz2f:
+        bz2f.seek(begin)
+        return bz2.decompress(bz2f.read(end - begin))
+
+
+def page_from_slice(buffer: bytes, page_begin: int, page_end: int, buffer_offset: int, encoding: str) -> WikiPage:
+    '''Locates the title, the text and the id tags in the buffer[page_begin:page_end] page and returns them as a WikiPage.'''
+    title = ''
+    title_begin = buffer.find(b'<title>', page_begin, page_end)
+    if title_begin != -1:
+        title_begin += len(b'<title>')
+        title_end = buffer.find(b'</title>', title_begin, page_end)
+        if title_end != -1:
+            title = decode_xml_slice(buffer, title_begin, title_end, encoding)
+    text = ''
+    text_tag = buffer.find(b'<text', page_begin, page_end)
+    if text_tag != -1:
+        text_begin = buffer.find(b'>', text_tag, page_end) + 1
+        if buffer[text_begin - 2:text_begin] != b'/>':  # <text ... /> stands for an empty page
+            text_end = buffer.rfind(b'</text>', text_begin, page_end)
+            if text_end != -1:
+                text = decode_xml_slice(buffer, text_begin, text_end, encoding)
+    page_id = tag_content(buffer, b'id', page_begin, page_end)
+    revision_id = sha1 = ''
+    revision_begin = buffer.find(b'<revision>', page_begin, page_end)
+    if revision_begin != -1:
+        revision_id = tag_content(buffer, b'id', revision_begin, page_end)
+        sha1 = tag_content(buffer, b'sha1', revision_begin, page_end)
+    return WikiPage(title, text, buffer_offset + page_begin, page_end - page_begin, page_id, revision_id, sha1)
+
+
+def tag_content(buffer: bytes, tag: bytes, begin: int, end: int) -> str:
+    '''Returns the (ascii) content of the first <tag> .. </tag> element in buffer[begin:end], or '' if there is none.'''
+    content_begin = buffer.find(b'<' + tag + b'>', begin, end)
+    if content_begin == -1:
+        return ''
+    content_begin += len(tag) + 2
+    content_end = buffer.find(b'</' + tag + b'>', content_begin, end)
+    if content_end == -1:
+        return ''
+    return buffer[content_begin:content_end].decode('ascii', 'replace')
+
+
+def decode_xml_slice(buffer: bytes, begin: int, end: int, encoding: str) -> str:
+    string = buffer[begin:end].decode(encoding)
+    if '\r' in string:  # the same newline translation as in text mode
+        string = string.replace('\r\n', '\n').replace('\r', '\n')
+    return string
+
+
+#####################################
+#  Per-page time budget             #
+#####################################
+
+class PageTimeout(Exception):
+    """Raised when the clean-up and the parsing of a page take longer than the time budget of DumpParser."""
+
+
+def _raise_page_timeout(signum, frame):
+    raise PageTimeout()
+
+
+def can_enforce_time_budget() -> bool:
+    '''Returns True iff time_budget() can interrupt the current thread: only in the main thread of a process, on platforms with SIGALRM (not on Windows).'''
+    return hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread()
+
+
+@contextlib.contextmanager
+def time_budget(seconds):
+    '''Raises PageTimeout in the with-block once it has run for seconds (also in the middle of a regex match: the re module checks for signals while matching).
+    If seconds is None, or if the budget cannot be enforced (see can_enforce_time_budget), the block is not interrupted.'''
+    if seconds is None or not can_enforce_time_budget():
+        yield
+        return
+    previous_handler = signal.signal(signal.SIGALRM, _raise_page_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+#####################################
+#  Page-level driver                #
+#####################################
+
+class DumpParser:
+    """Reads a German wiktionary xml file page by page and dispatches every page to the registered dictionaries."""
+
+    def __init__(self, file_path, encoding='utf-8', workers=1, chunk_size=1000, decompression_workers=1, index_path=None, revisions_path=None,
+                 cache_path=None, cache_max_bytes=PARSE_CACHE_MAX_BYTES, report_path=None, page_time_budget=None, retry_time_budget=None, quarantine_path=None):
+        '''
+        :param file_path: the path of the German wiktionary xml file (a .xml.bz2 or .xml.gz compressed dump is decompressed on the fly).
+        :param encoding: optional string argument specifying the file encoding (default: 'utf-8').
+        :param workers: the number of processes parsing the pages. With workers > 1, chunks of chunk_size pages are parsed in a process pool and the results are merged in page order, so the dictionaries are the same as with the serial run.
+        :param chunk_size: the number of pages sent to a worker process at a time (only relevant if workers > 1).
+        :param decompression_workers: the number of processes decompressing a multistream .bz2 dump (see iter_dump_blocks).
+        :param index_path: optional path of the multistream index of a .bz2 dump (see iter_dump_blocks).
+        :param revisions_path: optional path of a json sidecar file mapping the page ids of the xml to their [revision id, sha1, title]. If given, the sidecar is (over)written at the end of run().
+        If a sidecar already exists at revisions_path, it is taken to describe the xml from which the previous dictionaries (see register) were generated, and the pages whose revision has not changed since are not parsed again (incremental rebuild).
+        The sidecar also records the parsers of the dictionaries (see WordEntriesDict.parser_key): a previous dictionary generated by another parser version (or with other parse_options) is not reused.
+        :param cache_path: optional path of a ParseCache database: the parse results of the pages are looked up in it before parsing (and added to it after parsing).
+        :param cache_max_bytes: the maximum size of the results kept in the parse cache, the least recently used ones are evicted at the end of run().
+        :param report_path: optional path of a json file. If given, run() collects statistics in self.instrumentation (time and calls per stage, regex matches, skipped pages, slowest pages; see Instrumentation) and exports them to this file.
+        :param page_time_budget: optional number of seconds after which the clean-up and the parsing of a page are interrupted. The page is then quarantined, i.e., skipped
+        (counted as 'quarantined' by dispatch) and recorded in self.quarantined (see quarantine), so that a single pathological page cannot stall a run. (Enforced with SIGALRM, see time_budget.)
+        :param retry_time_budget: optional number of seconds. If given, a page interrupted by the page_time_budget is parsed once more with clean_up_string_safe (slower, but in linear time) within this budget, and only quarantined if it runs out of time again.
+        :param quarantine_path: optional path of a file to which the quarantined pages (and the retried ones) are written as json lines of their title, page id, size in bytes and the outcome of the retry.
+        '''
+        self.file_path = file_path
+        self.encoding = encoding
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.decompression_workers = decompression_workers
+        self.index_path = index_path
+        self.dictionaries = []
+        self.previous = []  # the previous versions of the registered dictionaries (or None), for incremental rebuilds
+        self.stream_paths = []  # the JSON Lines files to which the entries of the registered dictionaries are streamed (or None)
+        self.stream_files = None  # the open stream files (or None), while run() is running
+        self.streamed = None  # the number of entries written to each stream file
+        self.revisions_path = revisions_path
+        self.old_revisions = {}
+        self.new_revisions = None if revisions_path is None else {}
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        self.cache = None  # the ParseCache, while run() is running
+        self.skipped = Counter()  # number of pages skipped at each filtering stage of dispatch()
+        self.report_path = report_path
+        self.instrumentation = None if report_path is None else Instrumentation()
+        self.page_time_budget = page_time_budget
+        self.retry_time_budget = retry_time_budget
+        self.quarantine_path = quarantine_path
+        self.quarantine_file = None  # the open quarantine file, while run() is running
+        self.quarantined = []  # the records of the pages that ran out of the page_time_budget (see quarantine)
+        self.start_time = None
+
+    def register(self, *dictionaries, previous=None, stream_paths=None):
+        '''Registers dictionaries (instances of WordEntriesDict subclasses implementing parse_page, e.g., GermanNounEntriesDict) to be populated by run().
+        :param previous: optional list of the dictionaries of the same type generated from the previous xml (one for each dictionary, or None), whose entries are reused for unchanged pages (see revisions_path).
+        :param stream_paths: optional list of JSON Lines file paths (one for each dictionary, or None). The entries of a dictionary with a stream path are written to that file
+        as soon as they are parsed and removed from the dictionary (after every page, or after every chunk of pages if workers > 1), so that the dictionary need not fit into memory
+        (see WordEntriesDict.retrieve_from_jsonl and iter_jsonl_entries for reading the file).'''
+        if previous is None:
+            previous = [None] * len(dictionaries)
+        if stream_paths is None:
+            stream_paths = [None] * len(dictionaries)
+        if len(previous) != len(dictionaries):
+            raise ValueError('A previous dictionary (or None) must be given for each dictionary registered.')
+        if len(stream_paths) != len(dictionaries):
+            raise ValueError('A stream path (or None) must be given for each dictionary registered.')
+        for dic, previous_dic, stream_path in zip(dictionaries, previous, stream_paths):
+            if not isinstance(dic, WordEntriesDict):
+                raise TypeError('Only WordEntriesDict instances can be registered, not {0}.'.format(type(dic).__name__))
+            self.dictionaries.append(dic)
+            self.previous.append(previous_dic)
+            self.stream_paths.append(stream_path)
+        if any(previous_dic is not None for previous_dic in self.previous) and self.revisions_path is not None and os.path.exists(self.revisions_path):
+            with open(self.revisions_path, 'r', encoding='utf-8') as revf:
+                self.old_revisions = json.load(revf)
+            old_parsers = self.old_revisions.pop(REVISIONS_PARSERS_KEY, [])  # (none in a sidecar written before the parsers were recorded)
+            for i, dic in enumerate(self.dictionaries):
+                if self.previous[i] is not None and dic.parser_key() not in old_parsers:
+                    print('The previous {0} was not generated by the current parser: all its pages are parsed again.'.format(type(dic).__name__))
+                    self.previous[i] = None
+        return self
+
+    def pages(self):
+        '''Yields the pages of the wiktionary xml file as WikiPage tuples.'''
+        pages = iter_wiki_pages(self.file_path, encoding=self.encoding, decompression_workers=self.decompression_workers, index_path=self.index_path)
+        if self.instrumentation is not None:
+            pages = timed_iter('iter_wiki_pages', pages)  # the time of reading (and decompressing) the xml
+        return pages
+
+    def print_progress(self, page_no: int):
+        '''Prints the number of pages read so far (and the reading rate) after every 50000 pages.'''
+        if page_no % 50000 == 0:
+            print('{0} pages processed ({1:.0f} pages/sec)'.format(page_no, page_no / (time.perf_counter() - self.start_time)))
+
+    def reuse_unchanged(self, page: WikiPage) -> list:
+        '''Records the revision of the page and, if it is the same as in the previous xml, copies the entries of the page from the previous dictionaries.
+        Returns the list of the indexes of the registered dictionaries that still have to parse the page.'''
+        indexes = list(range(len(self.dictionaries)))
+        if self.new_revisions is None:
+            return indexes
+        revision = [page.revision_id, page.sha1, page.title]
+        self.new_revisions[page.page_id] = revision
+        if self.old_revisions.get(page.page_id) != revision:
+            return indexes
+        page_title = clean_up_string(page.title)
+        to_parse = []
+        for i in indexes:
+            previous_dic = self.previous[i]
+            if previous_dic is None:
+                to_parse.append(i)
+            elif page_title in previous_dic:
+                self.dictionaries[i][page_title] = previous_dic[page_title]
+        if not to_parse:
+            self.skipped['unchanged'] += 1
+        return to_parse
+
+    def save_revisions(self):
+        '''Writes the page revisions of the xml to the revisions_path sidecar file.'''
+        temp_path = self.revisions_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as revf:
+            json.dump(dict(self.new_revisions, **{REVISIONS_PARSERS_KEY: [dic.parser_key() for dic in self.dictionaries]}), revf)
+        os.replace(temp_path, self.revisions_path)
+
+    @timed_stage
+    def dispatch(self, page: WikiPage, indexes=None):
+        '''Cleans up the title and the wikitext of a page and passes them on to the parse_page() method of the registered dictionaries (of those at indexes, if specified).
+        Irrelevant pages are filtered out as early (and cheaply) as possible, the number of pages skipped at each stage is counted in self.skipped:
+        'namensraum' (untitled pages and pages under wiktionary-namespaces), 'not_german' (no 'Deutsch' in the raw wikitext),
+        'no_target_word_type' (none of the prefilter_keywords of the dictionaries in the raw wikitext), 'no_match' (no dictionary found information on the cleaned-up page),
+        'quarantined' (the page ran out of the page_time_budget, see quarantine).
+        (Pages not parsed again because they have not changed since the previous xml are counted as 'unchanged' by reuse_unchanged.)'''
+        page_title = clean_up_string(page.title)
+        ## Ignore untitled pages and pages under wiktionary-namespaces:
+        if not page_title or in_namensraum(page_title):
+            self.skipped['namensraum'] += 1
+            return
+        ## Cheap substring tests on the raw wikitext (cleaning up only deletes markup, it does not create words):
+        if 'Deutsch' not in page.text:
+            self.skipped['not_german'] += 1
+            return
+        dictionaries = self.dictionaries if indexes is None else [self.dictionaries[i] for i in indexes]
+        dictionaries = [dic for dic in dictionaries if not dic.prefilter_keywords or any(keyword in page.text for keyword in dic.prefilter_keywords)]
+        if not dictionaries:
+            self.skipped['no_target_word_type'] += 1
+            return
+        matched = False
+        if self.cache is not None:
+            page_hash = ParseCache.page_hash(page_title, page.text)
+            to_parse = []
+            for dic in dictionaries:
+                relevant = self.cache.lookup(dic, page_title, page_hash)
+                if relevant is None:
+                    to_parse.append(dic)
+                elif relevant:
+                    matched = True
+            dictionaries = to_parse
+        if dictionaries:
+            try:
+                with time_budget(self.page_time_budget):
+                    results = self.parse_cleaned_up(page_title, page.text, dictionaries, clean_up_string)
+            except PageTimeout:
+                results = self.quarantine(page, page_title, dictionaries)
+                if results is None:
+                    self.skipped['quarantined'] += 1
+                    return
+            for dic, relevant, entry in results:
+                if entry is not None:
+                    dic.merge_entry(page_title, entry)
+                if self.cache is not None:
+                    self.cache.store(dic, page_hash, relevant, entry)
+                if relevant:
+                    matched = True
+        if not matched:
+            self.skipped['no_match'] += 1
+
+    def parse_cleaned_up(self, page_title: str, page_text: str, dictionaries: list, clean_up=clean_up_string) -> list:
+        '''Cleans up the wikitext of a page with clean_up and parses it with each of the dictionaries. Returns a list of (dictionary, return value of parse_page(), entry) triples.
+        With a parse cache or a time budget, the page is parsed into empty copies of the dictionaries and entry is the entry found (or None), to be added to the dictionary by dispatch()
+        (so that the entry can be cached, and so that the dictionaries are left untouched by a page interrupted halfway). Otherwise, the page is parsed into the dictionaries themselves and entry is None.
+        Either way, the strings of the entries end up interned (see intern_entry and WordEntriesDict.merge_entry).'''
+        ## Cleaning up page before parsing:
+        one_page_str = clean_up(page_text)
+        results = []
+        for dic in dictionaries:
+            if self.cache is None and self.page_time_budget is None:
+                relevant = dic.parse_page(page_title, one_page_str)
+                if page_title in dic:
+                    dic[page_title] = intern_entry(dic[page_title])
+                results.append((dic, relevant, None))
+            else:
+                scratch = type(dic)()
+                scratch.__dict__.update(dic.parse_option_values())
+                relevant = scratch.parse_page(page_title, one_page_str)
+                results.append((dic, relevant, scratch.get(page_title)))
+        return results
+
+    def quarantine(self, page: WikiPage, page_title: str, dictionaries: list):
+        '''Handles a page that ran out of the page_time_budget: retries it with clean_up_string_safe within the retry_time_budget (if given), and records it in self.quarantined
+        (and in the quarantine file, if any). Returns the results of the retry (see parse_cleaned_up), or None if the page was not retried or ran out of time again.'''
+        results = None
+        if self.retry_time_budget is not None:
+            try:
+                with time_budget(self.retry_time_budget):
+                    results = self.parse_cleaned_up(page_title, page.text, dictionaries, clean_up_string_safe)
+            except PageTimeout:
+                pass
+        self.log_quarantined({'title': page_title, 'page_id': page.page_id, 'bytes': page.length,
+                              'retry': None if self.retry_time_budget is None else 'parsed' if results is not None else 'timeout'})
+        return results
+
+    def flush_streams(self):
+        '''Writes the entries of the dictionaries with a stream path to their stream files, and removes them from the dictionaries.'''
+        for i, stream_file in enumerate(self.stream_files):
+            if stream_file is not None and self.dictionaries[i]:
+                for headword, entry in self.dictionaries[i].items():
+                    write_jsonl_entry(stream_file, headword, entry)
+                self.streamed[i] += len(self.dictionaries[i])
+                self.dictionaries[i].clear()
+
+    def log_quarantined(self, record: dict):
+        '''Adds the record of a quarantined page to self.quarantined, and writes it to the quarantine file (while run() is running).'''
+        self.quarantined.append(record)
+        if self.quarantine_file is not None:
+            self.quarantine_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.quarantine_file.flush()
+
+    def timed_dispatch(self, page: WikiPage, indexes=None):
+        '''Calls dispatch(), recording the time it takes to parse the page in the instrumentation (for the statistics of the slowest pages).'''
+        start = time.perf_counter()
+        self.dispatch(page, indexes)
+        self.instrumentation.add_page(page.title, time.perf_counter() - start)
+
+    def run(self):
+        '''Populates the registered dictionaries from a single pass over the wiktionary xml file. Returns the number of pages read.'''
+        self.start_time = time.perf_counter()
+        if self.cache_path is not None:
+            self.cache = ParseCache(self.cache_path, self.cache_max_bytes)
+        if self.page_time_budget is not None and self.workers <= 1 and not can_enforce_time_budget():
+            print('Warning: the page time budget cannot be enforced on this platform (or outside of the main thread), pages will not be interrupted.')
+        if self.quarantine_path is not None:
+            self.quarantine_file = open(self.quarantine_path, 'w', encoding='utf-8')
+        self.stream_files = [None if stream_path is None else open(stream_path, 'w', encoding='utf-8') for stream_path in self.stream_paths]
+        self.streamed = [0] * len(self.dictionaries)
+        activate(self.instrumentation)
+        try:
+            if self.workers > 1:
+                page_no = self.run_parallel()
+            else:
+                page_no = self.run_serial()
+            self.flush_streams()
+        finally:
+            activate(None)
+            if self.quarantine_file is not None:
+                self.quarantine_file.close()
+                self.quarantine_file = None
+            for stream_file in self.stream_files:
+                if stream_file is not None:
+                    stream_file.close()
+            self.stream_files = None
+        for stream_path, streamed in zip(self.stream_paths, self.streamed):
+            if stream_path is not None:
+                print('Wrote {0} entries to {1}.'.format(streamed, stream_path))
+        print('Read {0} pages.'.format(page_no))
+        if self.skipped:
+            print('Skipped {0} pages ({1}).'.format(sum(self.skipped.values()), ', '.join('{0}: {1}'.format(stage, n) for stage, n in sorted(self.skipped.items()))))
+        if self.quarantined:
+            print('{0} pages ran out of the time budget of {1} seconds ({2} parsed on retry){3}.'.format(
+                len(self.quarantined), self.page_time_budget, sum(record['retry'] == 'parsed' for record in self.quarantined),
+                '' if self.quarantine_path is None else ', see {0}'.format(self.quarantine_path)))
+        if self.revisions_path is not None:
+            self.save_revisions()
+        if self.cache is not None:
+            print('Parse cache: {0} hits, {1} misses.'.format(self.cache.hits, self.cache.misses))
+            self.cache.close()
+            self.cache = None
+        if self.instrumentation is not None:
+            self.instrumentation.pages = page_no
+            self.instrumentation.seconds = time.perf_counter() - self.start_time
+            self.instrumentation.skipped.update(self.skipped)
+            self.instrumentation.export_to_json(self.report_path)
+        return page_no
+
+    def run_serial(self):
+        '''Parses the pages one by one in the current process.'''
+        dispatch = self.dispatch if self.instrumentation is None else self.timed_dispatch
+        page_no = 0
+        for page in self.pages():
+            page_no += 1
+            self.print_progress(page_no)
+            indexes = self.reuse_unchanged(page)
+            if indexes:
+                dispatch(page, indexes)
+            self.flush_streams()
+        return page_no
+
+    def run_parallel(self):
+        '''Parses the pages in a pool of self.workers processes. The partial dictionaries of the chunks are merged into the registered dictionaries in the original page order.
+        (Note: on platforms without fork, e.g., Windows, the calling script must be guarded by "if __name__ == '__main__':".)'''
+        templates = [(type(dic), dic.parse_option_values()) for dic in self.dictionaries]
+        settings = {'cache_path': self.cache_path, 'page_time_budget': self.page_time_budget, 'retry_time_budget': self.retry_time_budget,
+                    'slowest_n': None if self.instrumentation is None else self.instrumentation.slowest_n}  # the workers collect statistics iff slowest_n is not None
+        page_no = 0
+        page_titles = []  # the page order, to restore after an incremental rebuild (where unchanged entries are copied before the chunks are merged)
+        pending = deque()  # at most 2 * workers chunks are in flight, so that the xml is not read into memory faster than it is parsed
+        with multiprocessing.Pool(self.workers) as pool:
+            chunk = []  # (page, indexes of the dictionaries to parse it) pairs
+            for page in self.pages():
+                page_no += 1
+                self.print_progress(page_no)
+                indexes = self.reuse_unchanged(page)
+                if self.old_revisions:
+                    page_titles.append(page.title)
+                if indexes:
+                    chunk.append((page, indexes))
+                if len(chunk) == self.chunk_size:
+                    pending.append(pool.apply_async(_parse_chunk, ((templates, chunk, settings),)))
+                    chunk = []
+                    if len(pending) >= 2 * self.workers:
+                        self.merge(pending.popleft().get())
+            if chunk:
+                pending.append(pool.apply_async(_parse_chunk, ((templates, chunk, settings),)))
+            while pending:
+                self.merge(pending.popleft().get())
+        if page_titles:
+            self.restore_page_order(page_titles)
+        return page_no
+
+    def merge(self, partial_result: tuple):
+        '''Merges the dictionaries parsed from a chunk of pages into the registered dictionaries (usage by usage, should an entry already exist).'''
+        partial_dictionaries, skipped, cache_results, instrumentation, quarantined = partial_result
+        self.skipped.update(skipped)
+        for record in quarantined:
+            self.log_quarantined(record)
+        if cache_results is not None:
+            self.cache.add_results(*cache_results)
+        if instrumentation is not None:
+            self.instrumentation.merge(instrumentation)
+        for dic, partial in zip(self.dictionaries, partial_dictionaries):
+            for headword, entry in partial.items():
+                dic.merge_entry(headword, entry)
+        if not self.old_revisions:  # (the entries of an incremental rebuild are only streamed at the end, after restore_page_order)
+            self.flush_streams()
+
+    def restore_page_order(self, raw_page_titles: list):
+        '''Reorders the entries of the registered dictionaries according to the order of the pages in the xml.'''
+        for dic in self.dictionaries:
+            entries = dict(dic)
+            dic.clear()
+            for raw_title in raw_page_titles:
+                page_title = clean_up_string(raw_title)
+                if page_title in entries:
+                    dic[page_title] = entries.pop(page_title)
+            dic.update(entries)
+
+
+def _parse_chunk(task):
+    '''Worker function of DumpParser.run_parallel: parses a list of (WikiPage, dictionary indexes) pairs into fresh copies of the registered dictionaries.'''
+    templates, chunk, settings = task
+    parser = DumpParser(None, page_time_budget=settings['page_time_budget'], retry_time_budget=settings['retry_time_budget'])
+    if settings['cache_path'] is not None:
+        parser.cache = ParseCache(settings['cache_path'], read_only=True)
+    if settings['slowest_n'] is not None:
+        parser.instrumentation = Instrumentation(settings['slowest_n'])
+    for dic_class, attributes in templates:
+        dic = dic_class()
+        dic.__dict__.update(attributes)
+        parser.register(dic)
+    dispatch = parser.dispatch if parser.instrumentation is None else parser.timed_dispatch
+    activate(parser.instrumentation)
+    for page, indexes in chunk:
+        dispatch(page, indexes)
+    activate(None)
+    cache_results = None
+    if parser.cache is not None:
+        cache_results = parser.cache.new, parser.cache.used, parser.cache.hits, parser.cache.misses
+        parser.cache.close()
+    return [dict(dic) for dic in parser.dictionaries], parser.skipped, cache_results, parser.instrumentation, parser.quarantined
+
+
+def generate_dictionaries(file_path, *dictionaries, encoding='utf-8', workers=1, decompression_workers=1, previous=None, revisions_path=None, cache_path=None, report_path=None,
+                          page_time_budget=None, retry_time_budget=None, quarantine_path=None, stream_paths=None):
+    '''Populates all the dictionaries (e.g., a GermanNounEntriesDict, a GermanAdjEntriesDict and their translation dictionaries) from a single pass over the German wiktionary xml
+    (or .xml.bz2, .xml.gz dump) at file_path, using workers processes for parsing and decompression_workers processes for decompressing a multistream .bz2 dump.
+    For an incremental rebuild, pass the list of the dictionaries generated from the previous xml as previous, together with the revisions_path sidecar written by that run (see DumpParser).
+    With cache_path, the parse results are looked up in (and added to) a ParseCache database at that path. With report_path, a json report of the statistics of the run is exported to that path (see Instrumentation).
+    With page_time_budget (in seconds), pages taking longer are skipped and logged to quarantine_path (after a retry with the safe clean-up within retry_time_budget, if given; see DumpParser).
+    With stream_paths (a list of JSON Lines file paths, one for each dictionary, or None), the entries of the dictionaries are written to these files as soon as they are parsed, instead of being kept in the dictionaries.'''
+    print('Generating {0} dictionaries from wiktionary source: {1}\nThis may take several minutes . . .'.format(len(dictionaries), file_path))
+    DumpParser(file_path, encoding=encoding, workers=workers, decompression_workers=decompression_workers, revisions_path=revisions_path, cache_path=cache_path, report_path=report_path,
+               page_time_budget=page_time_budget, retry_time_budget=retry_time_budget, quarantine_path=quarantine_path).register(*dictionaries, previous=previous, stream_paths=stream_paths).run()
+    for dic, stream_path in zip(dictionaries, stream_paths or [None] * len(dictionaries)):
+        if stream_path is None:
+            print('Generated {0} entries for {1}.'.format(len(dic), type(dic).__name__))
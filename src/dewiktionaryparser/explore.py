@@ -2,6 +2,8 @@
 # -*- coding: utf-8 -*-
 
 from .common_defs import *
+from collections import defaultdict
+from collections.abc import Mapping
 import webbrowser
 import ujson
 
@@ -10,6 +12,109 @@ def bigcap(sets_list:list) -> set:
     return sets_list[0].intersection(*sets_list[1:])
 
 
+#################################################
+# Query index                                   #
+#################################################
+
+
+class QueryIndex:
+    """An index of the branches of a dictionary, built once, through which the functions below answer their queries on the whole dictionary
+    without walking all its entries (see build_query_index). The index reflects the dictionary at the time it was built."""
+
+    def __init__(self, dic):
+        '''
+        :param dic: the dictionary to be indexed (a WordEntriesDict, or a read-only one).
+        '''
+        print('Indexing the dictionary for queries . . .')
+        self.dic = dic
+        self.headwords = list(dic)
+        self.paths = {}  # key path below the headword (beginning with the usage) -> (numbers of the headwords with a branch at the path, {leaf element: numbers of the headwords with the element at the path})
+        for number, headword in enumerate(self.headwords):
+            for path, leaf in iter_branches(dic[headword]):
+                path_entry = self.paths.get(path)
+                if path_entry is None:
+                    path_entry = self.paths[path] = ([], {})
+                numbers, elements = path_entry
+                if not numbers or numbers[-1] != number:
+                    numbers.append(number)
+                for element in _leaf_elements(leaf):
+                    element_numbers = elements.get(element)
+                    if element_numbers is None:
+                        elements[element] = [number]
+                    elif element_numbers[-1] != number:
+                        element_numbers.append(number)
+        self.paths_by_key = defaultdict(list)  # key -> the key paths it occurs in
+        for path in self.paths:
+            for key in set(path):
+                self.paths_by_key[key].append(path)
+        self.usage_matrix = None  # built when first needed (see filter_entry_usages_by_keylists)
+        print('Indexed {0} distinct key paths in {1} entries.\n'.format(len(self.paths), len(self.headwords)))
+
+    def usages_by_key_value_pair(self, key, value) -> set:
+        '''Returns the set of the (headword number, usage) pairs of the usages in which value occurs in the twigs under key.'''
+        return {(number, path[0]) for path in self.paths_by_key.get(key, ()) if key in path[1:] for number in self.paths[path][1].get(value, ())}
+
+    def entries_by_key_value_pair(self, key, value) -> set:
+        '''Returns the set of the numbers of the headwords in whose entries value occurs in the twigs under key.'''
+        return {number for path in self.paths_by_key.get(key, ()) for number in self.paths[path][1].get(value, ())}
+
+    def leaves_by_key(self, key) -> list:
+        '''See leaves_by_key.'''
+        elements = set()
+        for path in self.paths_by_key.get(key, ()):
+            elements.update(self.paths[path][1])
+        if key in self.dic:  # the key is a headword
+            elements.update(element for _, leaf in iter_branches(self.dic[key]) for element in _leaf_elements(leaf))
+        return sorted(elements)
+
+    def headwords_by_key_value_pairs(self, *key_value:tuple, by_usage=True) -> list:
+        '''See headwords_by_key_value_pairs.'''
+        if not key_value:
+            return sorted(w for w in self.dic if self.dic[w] or not by_usage)
+        if by_usage:
+            usages = set.intersection(*[self.usages_by_key_value_pair(key, val) for key, val in key_value])
+            return sorted({self.headwords[number] for number, _ in usages})
+        return sorted(self.headwords[number] for number in set.intersection(*[self.entries_by_key_value_pair(key, val) for key, val in key_value]))
+
+    def leaves_by_path_fragment(self, key_list:list, per_usage=False) -> list:
+        '''See leaves_by_path_fragment.'''
+        paths = [path for path in self.paths if all(k in path for k in key_list)]
+        if not per_usage:
+            return sorted(set().union(*[self.paths[path][1] for path in paths]))
+        path_set = set(paths)
+        return [leaf for number in sorted(set().union(*[self.paths[path][0] for path in paths]))
+                for path, leaf in iter_branches(self.dic[self.headwords[number]]) if path in path_set]
+
+    def filter_entry_usages_by_keylists(self, include_list:list, exclude_list:list, copy=False) -> WordEntriesDict:
+        '''See filter_entry_usages_by_keylists.'''
+        if self.usage_matrix is None:
+            self.usage_matrix = UsageFeatureMatrix(self.dic)
+        return self.usage_matrix.subdictionary(self.usage_matrix.select(include_list, exclude_list), entry_type=WordEntriesDict, copy=copy)
+
+
+def _leaf_elements(leaf):
+    return leaf if isinstance(leaf, (list, tuple)) else [leaf]
+
+
+def build_query_index(dic) -> QueryIndex:
+    '''Indexes dic for the queries of leaves_by_key, headwords_by_key_value_pairs, leaves_by_path_fragment and filter_entry_usages_by_keylists,
+    which use the index (stored as dic.query_index) from then on when they are called on dic. Rebuild the index after changing the dictionary.'''
+    index = QueryIndex(dic)
+    dic.query_index = index
+    return index
+
+
+def query_index(dic):
+    '''Returns the query index of dic (see build_query_index), or None if it has none, or its index is out of date (its number of entries has changed).'''
+    index = getattr(dic, 'query_index', None)
+    if index is None or index.dic is not dic:
+        return None
+    if len(index.headwords) != len(dic):
+        print('The query index of the dictionary is out of date (rebuild it with build_query_index), it is not used.')
+        return None
+    return index
+
+
 #################################################
 # Functions for exploring the dictionary        #
 #################################################
@@ -18,7 +123,7 @@ def bigcap(sets_list:list) -> set:
 def twigs_list_by_key(dic:dict, key) -> list:
     ''' Returns a list containing the twigs (lists of leaves) that are under the occurrences of key in dic '''
     twigs = []
-    if not isinstance(dic, dict):
+    if not isinstance(dic, Mapping):
         return twigs
     for k in dic:
         if k == key:
@@ -31,12 +136,18 @@ def twigs_list_by_key(dic:dict, key) -> list:
 def leaves_by_key(worddic:dict, key:str) -> list:
     '''Collects all the leaves under an arbitrary keyword in a dictionary, for example,
     leaves_by_key(word_entries, 'genus') collects every possible value that occurs under the genus keyword in word_entries.'''
+    index = query_index(worddic)
+    if index is not None:
+        return index.leaves_by_key(key)
     return sorted({leaf for leaves in twigs_list_by_key(worddic, key) for leaf in leaves})
 
 
 def leaves_by_path_fragment(dic:dict, key_list:list, per_usage=False) -> list:
     '''Accepts a dictionary and an arbitrary list of keywords (not necessarily existing in the dictionary). Returns the set of all the leaves in the dictionary that are under all the keys in the keylist (the empty set if a non-existent key has been used). For example, leaves_by_path_fragment(word_entries['Tee'], ['u2', 'akkusativ']) returns the akkusativ forms under usage 2 of the word Tee; and leaves_by_path_fragment(word_entries, ['nominativ', 'plural']) returns every nominativ plural form in word_entries.'''
-    twigs_list = [br[-1] for w in dic for br in branches(dic[w]) if all(k in br for k in key_list)]
+    index = query_index(dic)
+    if index is not None:
+        return index.leaves_by_path_fragment(key_list, per_usage)
+    twigs_list = [leaf for w in dic for path, leaf in iter_branches(dic[w]) if all(k in path for k in key_list)]
     if per_usage:
         return twigs_list
     else:
@@ -73,6 +184,9 @@ def headwords_by_key_value_pairs(worddic:dict, *key_value:tuple, by_usage=True)
         except AssertionError:
             print("No result generated, due to incorrect argument '{}'.\nIt should be a list or tuple of length 2 of the form (key, value).".format(kv_pair))
             return False
+    index = query_index(worddic)
+    if index is not None:
+        return index.headwords_by_key_value_pairs(*key_value, by_usage=by_usage)
     for w in worddic:
         if by_usage:
             for u in worddic[w]:
@@ -83,21 +197,15 @@ def headwords_by_key_value_pairs(worddic:dict, *key_value:tuple, by_usage=True)
                     headwords.add(w)
     return sorted(headwords)
 
-def filter_entry_usages_by_keylists(source_dict: WordEntriesDict, include_list:list, exclude_list:list) -> WordEntriesDict:
-    '''Returns a WordEntriesDict that contains entries of source_dict that only include the usages that have all the keys in include_list but none in exclude_list, e.g., filter_entry_usages_by_keylists(word_entries, ['plural'], ['singular', 'tantum']) returns a dictionary in the entries of which all the usages have a plural feature but no singular or tantum. '''
-    target_dict = WordEntriesDict()
-    for k in source_dict:
-        target_dict[k] = WordEntriesDict()
-        for u in source_dict[k]:
-            if all(twigs_list_by_key(source_dict[k][u], incl) for incl in include_list) and not any(twigs_list_by_key(source_dict[k][u], excl) for excl in exclude_list):
-                target_dict[k][u] = ujson.loads(ujson.dumps(source_dict[k][u]))
-            else:
-                continue
-        if target_dict[k]:
-            continue
-        else:
-            del target_dict[k]
-    return target_dict
+def filter_entry_usages_by_keylists(source_dict: WordEntriesDict, include_list:list, exclude_list:list, copy=False, matrix=None) -> WordEntriesDict:
+    '''Returns a WordEntriesDict that contains entries of source_dict that only include the usages that have all the keys in include_list but none in exclude_list, e.g., filter_entry_usages_by_keylists(word_entries, ['plural'], ['singular', 'tantum']) returns a dictionary in the entries of which all the usages have a plural feature but no singular or tantum.
+    The usages are shared with source_dict, unless copy=True (see UsageFeatureMatrix.subdictionary). For deriving several subdictionaries, pass the UsageFeatureMatrix of source_dict as matrix (or index source_dict with build_query_index). '''
+    if matrix is None:
+        index = query_index(source_dict)
+        if index is not None:
+            return index.filter_entry_usages_by_keylists(include_list, exclude_list, copy)
+        matrix = UsageFeatureMatrix(source_dict)
+    return matrix.subdictionary(matrix.select(include_list, exclude_list), entry_type=WordEntriesDict, copy=copy)
 
 
 def subdic_by_headwords(dic:WordEntriesDict, headwords:list) -> WordEntriesDict:
@@ -132,11 +240,11 @@ def charting_dictionary_space(dic:dict):
 
 def gen_the_rest(dic, chart):
     old_chart = ujson.loads(ujson.dumps(chart))
-    for br in branches(chart):
+    for path, _ in list(iter_branches(chart)):  # (chart is changed in the loop)
         telescope = {}
-        for new_key in sorted(keyrange(dic, br[:-1])):
+        for new_key in sorted(keyrange(dic, path)):
             telescope.update({new_key:'[...]'})
-            set_by_keypath(chart, br[:-1], telescope)
+            set_by_keypath(chart, path, telescope)
     if old_chart == chart:
         return
     else:
@@ -0,0 +1,119 @@
+#!python3
+# -*- coding: utf-8 -*-
+
+from collections import Counter, defaultdict
+import functools
+import heapq
+import json
+import time
+
+# Opt-in instrumentation of the parsing runs (see the instrumentation argument of DumpParser).
+# While an Instrumentation is active, the functions and methods decorated with @timed_stage record their cumulative time and their number of calls,
+# and count_matches() counts the matches of the regexes it is called for. While none is active, both cost no more than a global lookup.
+
+_active = None  # the Instrumentation collecting the statistics of the current run, if any
+
+
+class Instrumentation:
+    """Collects the statistics of a parsing run: time and calls per stage, regex matches, pages skipped per filter, and the slowest pages."""
+
+    def __init__(self, slowest_n=20):
+        '''
+        :param slowest_n: the number of the slowest pages (by the time they took to be parsed) to report.
+        '''
+        self.slowest_n = slowest_n
+        self.stage_seconds = defaultdict(float)  # cumulative seconds per stage (the time of a stage includes the time of the stages called from it)
+        self.stage_calls = Counter()
+        self.regex_matches = Counter()
+        self.skipped = Counter()  # pages skipped per filter of DumpParser.dispatch
+        self.slowest_pages = []  # a heap of (seconds, page title) pairs
+        self.pages = 0
+        self.seconds = 0.0
+
+    def add_stage(self, stage: str, seconds: float):
+        self.stage_seconds[stage] += seconds
+        self.stage_calls[stage] += 1
+
+    def add_page(self, page_title: str, seconds: float):
+        '''Records the time it took to parse a page, keeping it if it is among the slowest_n pages.'''
+        if len(self.slowest_pages) < self.slowest_n:
+            heapq.heappush(self.slowest_pages, (seconds, page_title))
+        elif seconds > self.slowest_pages[0][0]:
+            heapq.heapreplace(self.slowest_pages, (seconds, page_title))
+
+    def merge(self, other):
+        '''Adds the statistics collected by another Instrumentation (e.g., in a worker process) to self.'''
+        for stage, seconds in other.stage_seconds.items():
+            self.stage_seconds[stage] += seconds
+        self.stage_calls.update(other.stage_calls)
+        self.regex_matches.update(other.regex_matches)
+        self.skipped.update(other.skipped)
+        for seconds, page_title in other.slowest_pages:
+            self.add_page(page_title, seconds)
+
+    def report(self) -> dict:
+        '''Returns the statistics as a dictionary (ready for json export).'''
+        return {'pages': self.pages,
+                'seconds': self.seconds,
+                'pages_per_second': self.pages / self.seconds if self.seconds else None,
+                'stages': {stage: {'seconds': self.stage_seconds[stage], 'calls': self.stage_calls[stage]}
+                           for stage in sorted(self.stage_seconds, key=self.stage_seconds.get, reverse=True)},
+                'regex_matches': dict(self.regex_matches.most_common()),
+                'skipped_pages': dict(self.skipped.most_common()),
+                'slowest_pages': [{'title': page_title, 'seconds': seconds} for seconds, page_title in sorted(self.slowest_pages, reverse=True)]}
+
+    def export_to_json(self, file_path, encoding='utf-8'):
+        '''
+        For exporting the report of the run into a json file.
+        :param file_path: the json file path to which the report should be exported.
+        :param encoding: optional string argument specifying the file encoding (default: 'utf-8').
+        '''
+        print('Exporting instrumentation report to {0} . . .'.format(file_path))
+        with open(file_path, 'w', encoding=encoding) as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2)
+        print('Report exported.\n')
+
+
+def activate(instrumentation):
+    '''Makes instrumentation (an Instrumentation, or None to switch instrumentation off) collect the statistics of the stages and of the regexes.'''
+    global _active
+    _active = instrumentation
+
+
+def timed_stage(function):
+    '''Decorator recording the time and the calls of a function (or method) as a stage named by its qualified name, e.g., GermanNounEntriesDict.parse_decl_table.'''
+    stage = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _active is None:
+            return function(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _active.add_stage(stage, time.perf_counter() - start)
+    return wrapper
+
+
+def count_matches(regex_name: str, matches=1):
+    '''Adds matches (an int, or any match result: a match object, None, or a list of matches) to the match count of the regex named regex_name.'''
+    if _active is not None:
+        if not isinstance(matches, int):
+            matches = len(matches) if isinstance(matches, list) else int(matches is not None)
+        _active.regex_matches[regex_name] += matches
+
+
+def timed_iter(stage: str, iterable):
+    '''Yields the items of iterable, recording the time spent in producing them as a stage (e.g., reading the xml).'''
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            if _active is not None:
+                _active.add_stage(stage, time.perf_counter() - start)
+        yield item
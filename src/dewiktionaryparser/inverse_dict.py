@@ -0,0 +1,87 @@
+#!python3
+# -*- coding: utf-8 -*-
+
+from .common_defs import *
+from .binary_dict import *
+import heapq
+import itertools
+import os
+import tempfile
+import ujson
+
+# Out-of-core construction of inverse dictionaries (see WordEntriesDict.make_inv_dict), for dictionaries whose inverse does not fit into memory
+# next to them (e.g., the inverse of the noun, adjective and translation dictionaries together): the (leaf element, headword) pairs are collected
+# in batches of at most spill_size pairs, each batch is sorted and written to a spill file, and the spill files are merged (k-way, with heapq.merge)
+# into the entries of the inverse dictionary, which are written to a JSON Lines or a binary dictionary file one by one.
+
+INVERSE_SPILL_SIZE = 1000000  # default number of pairs kept in memory before they are spilled to a file
+
+
+def write_inverse_dict(file_path, *sources, file_format='jsonl', spill_size=INVERSE_SPILL_SIZE, temp_dir=None) -> int:
+    '''Writes the inverse dictionary of one or more dictionaries to file_path, without keeping the inverse dictionary in memory. Returns the number of its entries.
+    The keys (leaf elements) are in sorted order, and so are the headwords in their lists (make_inv_dict lists them in no particular order).
+    :param sources: the dictionaries, each either a WordEntriesDict (or a read-only one, e.g., a MappedWordEntriesDict), whose leaves are selected with the default arguments of its make_inv_dict,
+    or a (dictionary, exclude, include) tuple (see make_inv_dict).
+    :param file_format: 'jsonl' for a JSON Lines file (see WordEntriesDict.retrieve_from_jsonl), or 'binary' for a binary dictionary file (see MappedWordEntriesDict).
+    :param spill_size: the maximum number of (leaf element, headword) pairs kept in memory.
+    :param temp_dir: the directory of the temporary spill files (default: the system's temporary directory).
+    '''
+    if file_format not in ('jsonl', 'binary'):
+        raise ValueError("file_format must be 'jsonl' or 'binary', not {0!r}.".format(file_format))
+    print('Generating entries for inverse dictionary . . .')
+    with tempfile.TemporaryDirectory(dir=temp_dir) as spill_dir:
+        spill_paths = []
+        pairs = []
+        for source in sources:
+            dic, exclude, include = source if isinstance(source, tuple) else (source, source.inv_dict_exclude, source.inv_dict_include)
+            for pair in dic.inverse_pairs(exclude, include):
+                pairs.append(pair)
+                if len(pairs) >= spill_size:
+                    spill_paths.append(spill_pairs(pairs, spill_dir, len(spill_paths)))
+                    pairs = []
+        if pairs or not spill_paths:
+            spill_paths.append(spill_pairs(pairs, spill_dir, len(spill_paths)))
+            pairs = []
+        print('Merging {0} spill files . . .'.format(len(spill_paths)))
+        spill_files = [open(spill_path, 'r', encoding='utf-8') for spill_path in spill_paths]
+        try:
+            entries = merge_spill_files(spill_files)
+            if file_format == 'binary':
+                entry_count = write_binary_entries(entries, file_path)
+            else:
+                entry_count = 0
+                with open(file_path, 'w', encoding='utf-8') as file:
+                    for leaf_element, headwords in entries:
+                        write_jsonl_entry(file, leaf_element, headwords)
+                        entry_count += 1
+        finally:
+            for spill_file in spill_files:
+                spill_file.close()
+    print('Wrote {0} entries of the inverse dictionary to {1}.\n'.format(entry_count, file_path))
+    return entry_count
+
+
+def spill_pairs(pairs: list, spill_dir, spill_no: int) -> str:
+    '''Sorts the pairs and writes them (without duplicates) to a new spill file in spill_dir, one json [leaf element, headword] array per line. Returns the path of the file.'''
+    pairs.sort()
+    spill_path = os.path.join(spill_dir, 'spill{0}.jsonl'.format(spill_no))
+    with open(spill_path, 'w', encoding='utf-8') as file:
+        previous = None
+        for pair in pairs:
+            if pair != previous:
+                file.write(ujson.dumps(pair, ensure_ascii=False))
+                file.write('\n')
+                previous = pair
+    return spill_path
+
+
+def merge_spill_files(spill_files: list):
+    '''Yields the (leaf element, sorted list of headwords) entries of the inverse dictionary from the sorted spill files, in the order of the leaf elements.'''
+    merged = heapq.merge(*[(tuple(ujson.loads(line)) for line in spill_file) for spill_file in spill_files])
+    for leaf_element, group in itertools.groupby(merged, key=lambda pair: pair[0]):
+        headwords = []
+        for _, headword in group:
+            if not headwords or headword != headwords[-1]:
+                headwords.append(headword)
+        yield leaf_element, headwords
+
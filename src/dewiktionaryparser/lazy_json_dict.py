@@ -0,0 +1,108 @@
+#!python3
+# -*- coding: utf-8 -*-
+
+from .common_defs import *
+from .binary_dict import *
+import mmap
+import os
+import ujson
+
+# A read-only view of a dictionary exported to json (by WordEntriesDict.export_to_json), for consumers that only look up a few entries:
+# instead of parsing the whole file, the byte offset and length of the value of every top-level key (headword) is indexed once,
+# and an entry is parsed only when it is looked up. The index is cached next to the json file as a binary dictionary (see binary_dict.py),
+# so that opening the json file again takes no more than memory-mapping the two files.
+
+JSON_INDEX_SUFFIX = '.index'
+
+json_token_regex = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]')  # a json string, or a bracket (the other tokens do not matter for finding where the values end)
+json_colon_regex = re.compile(rb'\s*:\s*')
+json_scalar_end_regex = re.compile(rb'\s*[,}]')
+
+
+def index_json_entries(buffer, encoding='utf-8'):
+    '''Yields (key, byte offset, byte length) triples of the values of the top-level keys of the json object in buffer (bytes or a memory-mapped json file),
+    without parsing the values themselves (only the strings and brackets are scanned).'''
+    depth = 0
+    key = None  # the key whose value is being scanned
+    begin = 0  # the byte offset of that value
+    for token in json_token_regex.finditer(buffer):
+        char = buffer[token.start()]
+        if char == 0x22:  # '"'
+            if depth != 1:
+                continue
+            if key is None:
+                key = json.loads(token.group().decode(encoding))
+                begin = json_colon_regex.match(buffer, token.end()).end()
+                if buffer[begin] not in b'"{[':  # a number, true, false or null
+                    yield key, begin, json_scalar_end_regex.search(buffer, begin).start() - begin
+                    key = None
+            else:  # a string value
+                yield key, begin, token.end() - begin
+                key = None
+        elif char == 0x7b or char == 0x5b:  # '{' or '['
+            if depth == 0 and char == 0x5b:
+                raise ValueError('The json file does not contain an object (a dictionary).')
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 1 and key is not None:
+                yield key, begin, token.end() - begin
+                key = None
+
+
+class LazyJsonWordEntriesDict(ReadOnlyWordEntriesDict):
+    """A read-only dictionary of the entries of a json file exported by WordEntriesDict.export_to_json, which parses an entry only when it is looked up."""
+
+    def __init__(self, file_path, encoding='utf-8', index_path=None):
+        '''
+        :param file_path: the path of the json file.
+        :param encoding: optional string argument specifying the file encoding (default: 'utf-8'; any encoding in which the json punctuation is ascii, e.g., 'ISO-8859-1').
+        :param index_path: the path of the cached index of the json file (default: file_path + '.index'). The index is (re)built if it does not exist or is older than the json file.
+        If it cannot be written, the index is only kept in memory.
+        '''
+        self.file_path = file_path
+        self.encoding = encoding
+        self.index_path = file_path + JSON_INDEX_SUFFIX if index_path is None else index_path
+        with open(file_path, 'rb') as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if not os.path.exists(self.index_path) or os.path.getmtime(self.index_path) < os.path.getmtime(file_path):
+            self.build_index()
+        else:
+            self.index = MappedWordEntriesDict(self.index_path)
+
+    def build_index(self):
+        '''Indexes the values of the headwords in the json file and saves the index to index_path (or keeps it in memory if it cannot be saved).'''
+        print('Indexing {0} . . .'.format(self.file_path))
+        index = {key: [begin, length] for key, begin, length in index_json_entries(self.mmap, self.encoding)}
+        try:
+            write_binary_dict(index, self.index_path)
+            self.index = MappedWordEntriesDict(self.index_path)
+        except OSError as ex:
+            print('The index could not be saved ({0}), it is kept in memory only.'.format(ex))
+            self.index = index
+        print('Indexed {0} entries.\n'.format(len(index)))
+
+    def __getitem__(self, headword):
+        begin, length = self.index[headword]
+        return ujson.loads(self.mmap[begin:begin + length].decode(self.encoding))
+
+    def __contains__(self, headword):
+        return headword in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        '''Unmaps the json file (and its index).'''
+        if isinstance(self.index, MappedWordEntriesDict):
+            self.index.close()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
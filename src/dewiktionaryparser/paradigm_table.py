@@ -0,0 +1,159 @@
+#!python3
+# -*- coding: utf-8 -*-
+
+from .common_defs import *
+from .de_wikt_noun_info_parser import GermanNounEntriesDict
+from array import array
+import itertools
+
+# A columnar form of the declension information ('gen_case_num') of a GermanNounEntriesDict, for bulk queries on all the nouns
+# (e.g., the nouns whose genitive singular ends in -s) without walking the nested dicts of the entries.
+# The table has a row for each declension (sg1/pl1, sg2/pl2, etc.) of each usage of each headword, in the order of the dictionary, and the columns
+#   headword, usage        string numbers of the headword and of the usage index ('u1', 'u2', etc.),
+#   slot                   the number of the declension (1 for the sg1 and pl1 cells, etc.),
+#   genus, <case> <number> cell numbers of the genus (the genus value of the sg slot) and of the eight cells of the declension table (e.g., 'genitiv singular').
+# Every column is an array. The strings are stored once in a string pool shared by all the columns, and a cell (the list of forms in the cell, e.g., ['Staats', 'Staates'])
+# is stored once in a cell pool as a tuple of the strings of the pool: many cells are the same for several rows or columns. Cell number 0 stands for a missing cell.
+#
+# A query evaluates its condition once for each distinct cell of a column, and then scans the column with the results (see NounParadigmTable.select).
+
+PARADIGM_CASES = ['nominativ', 'genitiv', 'dativ', 'akkusativ']
+PARADIGM_NUMBERS = ['singular', 'plural']
+PARADIGM_CELLS = [(case, number) for case in PARADIGM_CASES for number in PARADIGM_NUMBERS]
+PARADIGM_COLUMNS = ['genus'] + [case + ' ' + number for case, number in PARADIGM_CELLS]  # the names of the cell columns
+SLOT_PREFIXES = {'singular': 'sg', 'plural': 'pl'}
+
+slot_key_regex = re.compile(r"(sg|pl)(\d+)")
+slot_key_numbers = {}  # the declension numbers of the slot keys seen so far (see slot_number)
+
+
+def slot_number(slot_key: str) -> int:
+    '''Returns the declension number of a slot key, e.g., 2 for 'sg2' or 'pl2'.'''
+    slot_match = slot_key_regex.fullmatch(slot_key)
+    if not slot_match:
+        raise ValueError('{0!r} is not a declension slot key (sg1, pl1, etc.).'.format(slot_key))
+    number = slot_key_numbers[slot_key] = int(slot_match.group(2))
+    return number
+
+
+class NounParadigmTable:
+    """The declension information of a GermanNounEntriesDict as a table with a row per declension of a usage (see above), built by GermanNounEntriesDict.make_paradigm_table.
+    The usages without 'gen_case_num' information and the other information of the usages (e.g., 'tantum') are not part of the table."""
+
+    def __init__(self, dic=None):
+        '''
+        :param dic: the dictionary whose declension information is to be put into the table (a GermanNounEntriesDict, or any mapping of entries of the same format), or None for an empty table.
+        '''
+        self.strings = []  # the string pool
+        self.string_numbers = {}
+        self.cells = [None]  # the cell pool: tuples of strings of the string pool (cell number 0: no cell)
+        self.cell_numbers = {}
+        self.headword = array('I')
+        self.usage = array('I')
+        self.slot = array('H')
+        self.columns = {name: array('I') for name in PARADIGM_COLUMNS}
+        if dic is not None:
+            for headword, entry in dic.items():
+                self.add_entry(headword, entry)
+
+    def __len__(self):
+        return len(self.slot)
+
+    def __repr__(self):
+        return '<NounParadigmTable: {0} rows, {1} strings, {2} cells>'.format(len(self), len(self.strings), len(self.cells) - 1)
+
+    def _string_number(self, string: str) -> int:
+        number = self.string_numbers.get(string)
+        if number is None:
+            number = self.string_numbers[string] = len(self.strings)
+            self.strings.append(string)
+        return number
+
+    def _cell_number(self, forms) -> int:
+        cell = tuple(forms)
+        number = self.cell_numbers.get(cell)
+        if number is None:
+            number = self.cell_numbers[cell] = len(self.cells)
+            self.cells.append(tuple(self.strings[self._string_number(form)] for form in cell))
+        return number
+
+    def add_entry(self, headword: str, entry: dict):
+        '''Appends the rows of the declensions of the usages of entry (the entry of headword in a GermanNounEntriesDict).'''
+        headword_number = self._string_number(headword)
+        for usage_index, usage in entry.items():
+            gen_case_num = usage.get('gen_case_num')
+            if gen_case_num is None:
+                continue
+            slots = {}  # declension number -> {column name: forms}
+            for slot_key, forms in gen_case_num.get('genus', {}).items():
+                slots.setdefault(slot_key_numbers.get(slot_key) or slot_number(slot_key), {})['genus'] = forms
+            for case, number in PARADIGM_CELLS:
+                for slot_key, forms in gen_case_num.get(case, {}).get(number, {}).items():
+                    slots.setdefault(slot_key_numbers.get(slot_key) or slot_number(slot_key), {})[case + ' ' + number] = forms
+            usage_number = self._string_number(usage_index)
+            for slot, slot_cells in slots.items():
+                self.headword.append(headword_number)
+                self.usage.append(usage_number)
+                self.slot.append(slot)
+                for name, column in self.columns.items():
+                    forms = slot_cells.get(name)
+                    column.append(0 if forms is None else self._cell_number(forms))
+
+    ############################################
+    #    Queries                               #
+    ############################################
+
+    def cell(self, row: int, column: str):
+        '''Returns the list of the forms in the cell of row in column (e.g., 'genitiv singular'), or None if the row has no such cell.'''
+        cell = self.cells[self.columns[column][row]]
+        return None if cell is None else list(cell)
+
+    def select(self, column: str, condition, rows=None) -> list:
+        '''Returns the numbers of the rows with a form in their cell in column for which condition is true, e.g.,
+        select('genitiv singular', lambda form: form.endswith('s')) for the declensions whose genitive singular ends in -s.
+        :param column: the name of the column, 'genus' or '<case> <number>' (see PARADIGM_COLUMNS).
+        :param condition: a function of a form (a str) returning True or False.
+        :param rows: the row numbers (in increasing order) to which the selection is restricted, e.g., the result of a previous select, or None for all the rows.
+        '''
+        column_cells = self.columns[column]
+        cells = self.cells
+        cell_results = bytearray(len(cells))
+        for cell_number in set(column_cells if rows is None else map(column_cells.__getitem__, rows)):
+            if cell_number and any(map(condition, cells[cell_number])):
+                cell_results[cell_number] = 1
+        if rows is None:
+            return list(itertools.compress(range(len(column_cells)), map(cell_results.__getitem__, column_cells)))
+        return [row for row in rows if cell_results[column_cells[row]]]
+
+    def headwords(self, rows=None) -> list:
+        '''Returns the list of the headwords of the rows (e.g., the result of select; all the rows if rows is None), without repetitions, in the order of the rows.'''
+        if rows is None:
+            rows = range(len(self))
+        return list(dict.fromkeys(self.strings[self.headword[row]] for row in rows))
+
+    ############################################
+    #    Conversion to the nested form         #
+    ############################################
+
+    def to_entries(self, rows=None, dict_type=GermanNounEntriesDict):
+        '''Returns a dictionary of type dict_type with the declension information ('gen_case_num') of the rows (all the rows if rows is None) in the nested form of GermanNounEntriesDict,
+        e.g., to_entries(select(...)) for the usages of the selected declensions. (Of the declensions of a usage only the selected rows are included.)
+        The entries are equal to those of the dictionary the table was made of, restricted to the 'gen_case_num' information (but for empty dicts, which have no rows).
+        :param rows: the row numbers, in increasing order.
+        '''
+        strings, cells = self.strings, self.cells
+        layout = [(case, number, SLOT_PREFIXES.get(number, 'sg'), self.columns[name]) for name, (case, number) in zip(PARADIGM_COLUMNS, [('genus', None)] + PARADIGM_CELLS)]
+        dic = dict_type()
+        usage_key = None
+        for row in range(len(self)) if rows is None else rows:
+            if (self.headword[row], self.usage[row]) != usage_key:
+                usage_key = (self.headword[row], self.usage[row])
+                gen_case_num = {}
+                dic.setdefault(strings[usage_key[0]], {})[strings[usage_key[1]]] = {'gen_case_num': gen_case_num}
+            slot = str(self.slot[row])
+            for case, number, slot_prefix, column_cells in layout:
+                cell_number = column_cells[row]
+                if cell_number:
+                    slots = gen_case_num.setdefault(case, {}) if number is None else gen_case_num.setdefault(case, {}).setdefault(number, {})
+                    slots[slot_prefix + slot] = list(cells[cell_number])
+        return dic
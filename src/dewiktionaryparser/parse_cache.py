@@ -0,0 +1,122 @@
+#!python3
+# -*- coding: utf-8 -*-
+
+from .common_defs import *
+import hashlib
+import sqlite3
+import ujson
+
+# An on-disk cache of the parse_page() results of the dictionaries, so that re-running the parsers on an unchanged xml
+# (e.g., while working on code downstream of the dictionaries) costs little more than hashing the pages.
+# The results are keyed by the parser (the dictionary type, its parser_version and the values of its parse_options, e.g., strict)
+# and by a hash of the page title and the raw wikitext (clean_up_string is deterministic, so hashing the raw text lets cached pages skip the clean-up, too).
+
+
+PARSE_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # default size limit of the cached results
+PARSE_CACHE_FLUSH_SIZE = 10000  # number of new results kept in memory before they are written to the database
+
+
+class ParseCache:
+    """A size-bounded SQLite database of parse_page() results. The least recently used results are evicted once the cache grows beyond max_bytes."""
+
+    def __init__(self, path, max_bytes=PARSE_CACHE_MAX_BYTES, read_only=False):
+        '''
+        :param path: the path of the SQLite database file (created if it does not exist, unless read_only).
+        :param max_bytes: the maximum total size of the cached results in bytes (checked by close()).
+        :param read_only: iff true, the database is only queried, new results are collected in self.new and the hits in self.used, to be added to the cache by another ParseCache (see DumpParser.run_parallel).
+        '''
+        self.path = path
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.new = []  # (parser key, page hash, result, size) tuples not yet written to the database
+        self.used = []  # (parser key, page hash) pairs of the cache hits not yet marked as used in this run
+        self.hits = 0
+        self.misses = 0
+        if read_only:
+            self.connection = sqlite3.connect('file:{0}?mode=ro'.format(path), uri=True)
+            self.run_no = None
+        else:
+            self.connection = sqlite3.connect(path)
+            self.connection.execute('PRAGMA journal_mode=WAL')  # lets the worker processes read while new results are written
+            self.connection.execute('CREATE TABLE IF NOT EXISTS parse_results (parser TEXT, page_hash BLOB, result TEXT, size INTEGER, last_used INTEGER, PRIMARY KEY (parser, page_hash)) WITHOUT ROWID')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS parse_results_last_used ON parse_results (last_used)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS runs (run_no INTEGER PRIMARY KEY)')
+            self.run_no = self.connection.execute('INSERT INTO runs DEFAULT VALUES').lastrowid
+            self.connection.commit()
+        self.parser_keys = {}
+
+    @staticmethod
+    def page_hash(page_title: str, page_text: str) -> bytes:
+        '''Returns the hash of a page (of its title and its raw wikitext).'''
+        digest = hashlib.blake2b(page_title.encode('utf-8'), digest_size=20)
+        digest.update(b'\0')
+        digest.update(page_text.encode('utf-8'))
+        return digest.digest()
+
+    def parser_key(self, dic: WordEntriesDict) -> str:
+        '''Returns the string identifying the parser of a dictionary: its type, its parser_version and the values of its parse_options (which change the parse results, e.g., strict).
+        (Other attributes of the dictionary are left out, so that, e.g., a query_index built on it does not change the key.)'''
+        key = self.parser_keys.get(id(dic))
+        if key is None:
+            key = self.parser_keys[id(dic)] = dic.parser_key()
+        return key
+
+    def lookup(self, dic: WordEntriesDict, page_title: str, page_hash: bytes):
+        '''Adds the cached result of dic.parse_page() on the page to dic. Returns the cached return value of parse_page(), or None if the page is not in the cache.'''
+        parser = self.parser_key(dic)
+        row = self.connection.execute('SELECT result FROM parse_results WHERE parser = ? AND page_hash = ?', (parser, page_hash)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used.append((parser, page_hash))
+        relevant, entry = ujson.loads(row[0])
+        if entry is not None:
+            dic.merge_entry(page_title, entry)
+        return relevant
+
+    def store(self, dic: WordEntriesDict, page_hash: bytes, relevant: bool, entry):
+        '''Adds the result of dic.parse_page() on a page to the cache: its return value (relevant), and the entry it made (or None) when parsing into an empty copy of dic.'''
+        result = ujson.dumps([relevant, entry], ensure_ascii=False)
+        self.new.append((self.parser_key(dic), page_hash, result, len(result)))
+        if len(self.new) >= PARSE_CACHE_FLUSH_SIZE and not self.read_only:
+            self.flush()
+
+    def add_results(self, new: list, used: list, hits: int, misses: int):
+        '''Adds the new results and the hits collected by a read-only ParseCache (e.g., in a worker process).'''
+        self.new.extend(new)
+        self.used.extend(used)
+        self.hits += hits
+        self.misses += misses
+        if len(self.new) >= PARSE_CACHE_FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        '''Writes the new results to the database and marks the results used in this run.'''
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO parse_results VALUES (?, ?, ?, ?, {0})'.format(self.run_no), self.new)
+            self.connection.executemany('UPDATE parse_results SET last_used = {0} WHERE parser = ? AND page_hash = ?'.format(self.run_no), self.used)
+        self.new = []
+        self.used = []
+
+    def evict(self):
+        '''Deletes the least recently used results until the total size of the cached results is at most max_bytes.'''
+        total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM parse_results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for parser, page_hash, size in self.connection.execute('SELECT parser, page_hash, size FROM parse_results ORDER BY last_used'):
+            evicted.append((parser, page_hash))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        with self.connection:
+            self.connection.executemany('DELETE FROM parse_results WHERE parser = ? AND page_hash = ?', evicted)
+        print('Evicted {0} results from the parse cache.'.format(len(evicted)))
+
+    def close(self):
+        '''Flushes the new results, evicts the least recently used ones if the cache is too big, and closes the database.'''
+        if not self.read_only:
+            self.flush()
+            self.evict()
+        self.connection.close()
@@ -0,0 +1,246 @@
+#!python3
+# -*- coding: utf-8 -*-
+
+from .common_defs import *
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+
+# A lightweight section tree of a page, shared by the parsers of all the dictionaries: a single scan of the cleaned-up wikitext with section_token_regex
+# finds the 2nd-level (language) headings, the German 3rd-level (Wortart) headings and the template invocations (among them the subsection headings,
+# e.g., {{Worttrennung}} or {{Übersetzungen}}), and the page is split into its German usages, each of which knows the offsets of its Wortart headings and of its
+# templates by name. The parsers query the tree instead of rescanning the page and its usages with their regexes: a regex whose matches can only begin at
+# a given heading or template is run from the first such heading or template of the usage on (see UsageSection.search), and not at all if the usage has none.
+#
+# The tokens are zero-width (lookahead) matches, so that no token hides another one: a template invocation is found even inside a heading, etc.
+
+section_token_regex = re.compile(r"""(?=[={])(?:
+    (?=(?<!=)==\ (?P<headword>\w\S+)\ \(\{\{Sprache\|(?P<lang>\w+))  # a 2nd-level heading, as matched by new_heading_two_regex
+    |(?====\ \{\{Wortart\|(?P<wortart>[^|\n]+)\|Deutsch\}\})             # a German 3rd-level heading, as matched by new_usage_pattern within a line
+    |(?=\{\{(?P<template>[^{}|]*)))                                     # a template invocation, its name is followed by |, } or {
+    """, re.X)
+template_syntax_regex = re.compile(r"\{\{|\}\}|\[\[|\]\]|[|=]")  # the tokens delimiting the parts of a template invocation (see parse_template)
+template_part_regex = re.compile(r"([^|={}\[\]]*)(?:=([^|{}\[\]]*))?(\||\}\})")  # a part of a template invocation without nested templates and links
+innermost_template_regex = re.compile(r"\{\{[^{}]*\}\}")  # a template invocation without nested templates (see template_value_text)
+line_separators_regex = re.compile('[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')  # the line boundaries of str.splitlines() other than newline
+
+
+class UsageSection:
+    """A German usage of a page (see SectionTree.usages): its wikitext, its Wortart headings and its templates."""
+
+    def __init__(self, index: str, text: str, wortart_headings=None, templates=None):
+        '''
+        :param index: the usage index ('u1', 'u2', etc.).
+        :param text: the wikitext of the usage.
+        :param wortart_headings: the (offset, wortart, whether it is preceded by '=') triples of the Wortart headings in text, and
+        :param templates: the offsets of the templates in text by template name, if already known from the tokens of the page (otherwise text is scanned for them).
+        '''
+        self.index = index
+        self.text = text
+        if wortart_headings is None:
+            wortart_headings, templates = [], defaultdict(list)
+            for token in section_token_regex.finditer(text):
+                offset = token.start()
+                if token.lastgroup == 'template':
+                    templates[token.group('template')].append(offset)
+                elif token.lastgroup == 'wortart':
+                    wortart_headings.append((offset, token.group('wortart'), offset > 0 and text[offset - 1] == '='))
+        self.wortart_headings = wortart_headings
+        self.templates = templates
+
+    def has_wortart(self, wortarten) -> bool:
+        '''Returns True iff the usage has a Wortart heading with one of wortarten (e.g., WORTARTEN_NOUN), i.e., iff de_noun_regex (de_adj_regex for WORTARTEN_ADJ) matches the usage.'''
+        return self.first_wortart(wortarten) is not None
+
+    def first_wortart(self, wortarten):
+        '''Returns the offset of the first "=== {{Wortart|...|Deutsch}}" heading with one of wortarten not preceded by '=', or None if there is none.'''
+        for offset, wortart, after_equals in self.wortart_headings:
+            if wortart in wortarten and not after_equals:
+                return offset
+        return None
+
+    def first_template(self, name: str, prefix=False):
+        '''Returns the offset of the first invocation of the template name (of a template whose name begins with name, if prefix is True), or None if there is none.'''
+        if not prefix:
+            offsets = self.templates.get(name)
+            return offsets[0] if offsets else None
+        offsets = [offsets[0] for template, offsets in self.templates.items() if template.startswith(name)]
+        return min(offsets) if offsets else None
+
+    def search(self, regex, offset, lead=0):
+        '''Returns regex.search() on the text of the usage from offset - lead on (offset being the result of a query above), or None if offset is None.
+        The same as regex.search(self.text) if no match of regex can begin more than lead characters before the heading or template at offset.'''
+        if offset is None:
+            return None
+        return regex.search(self.text, max(offset - lead, 0))
+
+    def __repr__(self):
+        return '<UsageSection {0}: {1} characters, Wortart {2}>'.format(self.index, len(self.text), ', '.join(wortart for _, wortart, _ in self.wortart_headings))
+
+
+class SectionTree:
+    """The section tree of the cleaned-up wikitext of a page: its 2nd-level (language) headings and its German usages (see section_tree)."""
+
+    def __init__(self, one_page_str: str):
+        text = one_page_str
+        if line_separators_regex.search(text):  # the lines are the lines of str.splitlines()
+            text = '\n'.join(text.splitlines())
+            end = len(text)
+        else:
+            end = len(text) - 1 if text.endswith('\n') else len(text)
+        self.headings = []  # (offset, headword, language) triples of the 2nd-level headings
+        self.wortart_headings = []  # (offset, wortart, whether it is preceded by '=') triples
+        template_offsets, template_names = [], []
+        for token in section_token_regex.finditer(text, 0, end):
+            kind = token.lastgroup
+            if kind == 'template':
+                template_offsets.append(token.start())
+                template_names.append(token.group(kind))
+            elif kind == 'wortart':
+                offset = token.start()
+                self.wortart_headings.append((offset, token.group(kind), offset > 0 and text[offset - 1] == '='))
+            else:
+                self.headings.append((token.start(), token.group('headword'), token.group('lang')))
+        self.usages = self.split_usages(text, end, template_offsets, template_names)
+
+    def has_wortart(self, wortarten) -> bool:
+        '''Returns True iff the page has a Wortart heading with one of wortarten, i.e., iff de_noun_regex (de_adj_regex for WORTARTEN_ADJ) matches the page.'''
+        return any(wortart in wortarten and not after_equals for _, wortart, after_equals in self.wortart_headings)
+
+    def has_german_heading(self) -> bool:
+        '''Returns True iff the page has a German 2nd-level heading, i.e., iff de_headword_regex matches the page.'''
+        return any(language.startswith('Deutsch') for _, _, language in self.headings)
+
+    def split_usages(self, text: str, end: int, template_offsets: list, template_names: list) -> list:
+        '''Returns the UsageSection objects of the German usages of the page, in order. A usage consists of the lines from a German Wortart (===) heading up to
+        the next such heading, except for the lines in non-German (==) sections, joined with newlines. (As in the line-by-line splitter this replaces,
+        identical usages get the index of the first one, and the lines before the first usage heading are dropped, or, if there are none, the first usage.
+        A page beginning with a usage heading has no such lines, and its first usage is kept.)'''
+        german_by_line = {}  # line offset -> whether the first 2nd-level heading on the line is German
+        for offset, _, language in self.headings:
+            line = text.rfind('\n', 0, offset) + 1
+            if line not in german_by_line:
+                german_by_line[line] = language == 'Deutsch'
+        usage_lines = {text.rfind('\n', 0, offset) + 1 for offset, _, _ in self.wortart_headings}
+        stretched_usages = []  # each a list of the (begin, end) offsets of the German stretches of lines of a usage
+        usage = []
+        stretch_begin = 0  # None within a non-German section
+        for line in sorted(usage_lines.union(german_by_line)):
+            german = german_by_line.get(line)
+            if german is False and stretch_begin is not None:
+                if line > stretch_begin:
+                    usage.append((stretch_begin, line - 1))
+                stretch_begin = None
+            elif german and stretch_begin is None:
+                stretch_begin = line
+            if stretch_begin is not None and line in usage_lines:
+                if line > stretch_begin:
+                    usage.append((stretch_begin, line - 1))
+                if usage or not stretched_usages:  # (the first one is the lead-in before the first usage heading, even if there are no lines before it)
+                    stretched_usages.append(usage)
+                usage = []
+                stretch_begin = line
+        if stretch_begin is not None:
+            usage.append((stretch_begin, end))
+        stretched_usages.append(usage)
+        stretched_usages.pop(0)  # the lead-in (or, if there are no usage headings, the only usage)
+        heading_offsets = [offset for offset, _, _ in self.wortart_headings]
+        usages = []
+        first_numbers = {}
+        for number, stretches in enumerate(stretched_usages):
+            usage_str = text[stretches[0][0]:stretches[0][1]] if len(stretches) == 1 else '\n'.join(text[begin:stretch_end] for begin, stretch_end in stretches)
+            wortart_headings = []
+            usage_templates = defaultdict(list)
+            shift = 0  # the offset of the stretch in usage_str minus its offset in text
+            for begin, stretch_end in stretches:
+                shift -= begin
+                for i in range(bisect_left(heading_offsets, begin), bisect_left(heading_offsets, stretch_end)):
+                    offset, wortart, after_equals = self.wortart_headings[i]
+                    wortart_headings.append((offset + shift, wortart, after_equals and offset + shift > 0))
+                for i in range(bisect_left(template_offsets, begin), bisect_left(template_offsets, stretch_end)):
+                    usage_templates[template_names[i]].append(template_offsets[i] + shift)
+                shift += stretch_end + 1
+            usages.append(UsageSection('u' + str(first_numbers.setdefault(usage_str, number) + 1), usage_str, wortart_headings, usage_templates))
+        return usages
+
+
+TemplateInvocation = namedtuple('TemplateInvocation', ['name', 'params', 'begin', 'end'])
+# name: the template name; params: the list of the (key, value) pairs of the parameters, in order; begin, end: the offsets of the invocation in the text
+
+
+def parse_template(text: str, begin: int = 0) -> TemplateInvocation:
+    '''Parses the template invocation beginning (with '{{') at text[begin] in a single pass, and returns it as a TemplateInvocation, e.g.,
+    "{{Deutsch Substantiv Übersicht|Genus=f|Nominativ Singular=[[Mutter]]}}" -> ('Deutsch Substantiv Übersicht', [('Genus', 'f'), ('Nominativ Singular', '[[Mutter]]')], 0, 70).
+    The '|' and '=' characters within nested templates and links (e.g., "{{Ü|en|mother}}", "[[Mutter|Mütter]]") do not delimit parameters.
+    As in MediaWiki, the keys and the values of named parameters are stripped of whitespace, and the positional ones are numbered ('1', '2', etc.).
+    An invocation that is not closed extends to the end of text.'''
+    parts = []  # the (begin, offset of the first '=' or None, end) triples of the name and the parameters
+    pos = begin + 2
+    end = None
+    while end is None:
+        simple = template_part_regex.match(text, pos)
+        if simple:  # a part without templates, links or braces
+            parts.append((pos, simple.start(2) - 1 if simple.group(2) is not None else None, simple.start(3)))
+            pos = simple.end()
+            if simple.group(3) == '}}':
+                end = pos
+            continue
+        nested = []  # the openers ('{{' or '[[') of the templates and links open within the part
+        equals = None
+        for token in template_syntax_regex.finditer(text, pos):
+            syntax = token.group()
+            if syntax == '{{' or syntax == '[[':
+                nested.append(syntax)
+            elif syntax == '}}' and '{{' in nested:
+                while nested.pop() != '{{':  # (a link not closed within the nested template ends with it)
+                    pass
+            elif syntax == ']]':
+                if nested and nested[-1] == '[[':
+                    nested.pop()
+            elif syntax == '}}' or not nested and syntax == '|':
+                parts.append((pos, equals, token.start()))
+                pos = token.end()
+                if syntax == '}}':
+                    end = pos
+                break
+            elif not nested and equals is None:
+                equals = token.start()
+        else:
+            end = len(text)
+            parts.append((pos, equals, end))
+    params = []
+    position = 0
+    for part_begin, equals, part_end in parts[1:]:
+        if equals is None:
+            position += 1
+            params.append((str(position), text[part_begin:part_end]))
+        else:
+            params.append((text[part_begin:equals].strip(), text[equals + 1:part_end].strip()))
+    return TemplateInvocation(text[parts[0][0]:parts[0][2]].strip(), params, begin, end)
+
+
+def template_value_text(value: str) -> str:
+    '''Returns a parameter value of a template invocation (see parse_template) without the templates nested in it (e.g., references like "{{Ref-Duden}}"),
+    and with its links replaced by their labels (e.g., "[[Hahn|Hahnes]]" -> "Hahnes"), as clean_up_string does on the page. The rest of the value from a template
+    not closed within it is dropped, too.'''
+    while '{{' in value:
+        stripped = innermost_template_regex.sub('', value)
+        if stripped == value:  # a template not closed within the value
+            value = value[:value.index('{{')]
+        else:
+            value = stripped
+    if '[[' in value:
+        value = wiki_link_string.sub(r'\2', value)
+    return value
+
+
+_last_tree = None  # the section tree of the last page, shared by the parsers of the dictionaries
+
+
+@timed_stage
+def section_tree(one_page_str: str) -> SectionTree:
+    '''Returns the SectionTree of the cleaned-up wikitext of a page. The tree of the last page is kept, so that the parsers of all the dictionaries registered with
+    a DumpParser (which are handed over the same string) share it.'''
+    global _last_tree
+    if _last_tree is None or _last_tree[0] is not one_page_str:
+        _last_tree = (one_page_str, SectionTree(one_page_str))
+    return _last_tree[1]
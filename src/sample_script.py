@@ -24,9 +24,17 @@ import dewiktionaryparser as dw
 
 # initialize a dictionary for grammatical information:
 noun_entries = dw.GermanNounEntriesDict()
+# initialize a dictionary for translation information:
+translations = dw.GermanNounTranslationDict()
+# initialize the adjectival dictionaries for grammatical and translation information:
+adj_entries = dw.GermanAdjEntriesDict()
+adj_translations = dw.GermanAdjTranslationDict()
+
+# generate all four dictionaries from a single pass over dewiktionary-20180601-pages-meta-current.xml located in the data folder under current working directory:
+dw.generate_dictionaries('.\data\dewiktionary-20180601-pages-meta-current.xml', noun_entries, translations, adj_entries, adj_translations)
 
-# generate entries from dewiktionary-20180601-pages-meta-current.xml located in the data folder under current working directory:
-noun_entries.generate_entries('.\data\dewiktionary-20180601-pages-meta-current.xml')
+# # alternatively, generate entries from the xml file for the grammatical dictionary only:
+# noun_entries.generate_entries('.\data\dewiktionary-20180601-pages-meta-current.xml')
 # # save the resulting dictionary under the data folder of the current working dictionary:
 # noun_entries.export_to_json('.\data\de_noun_entries.json')
 
@@ -36,10 +44,8 @@ inv_dic = noun_entries.make_inv_dict()
 inv_dic.export_to_json('.\data\de_noun_entries_inv.json')
 
 
-# initialize a dictionary for translation information:
-translations = dw.GermanNounTranslationDict()
-# generate entries from dewiktionary-20180601-pages-meta-current.xml located in the data folder under current working directory:
-translations.generate_translations('.\data\dewiktionary-20180601-pages-meta-current.xml')
+# # generate translation entries only (not needed if generate_dictionaries has been called as above):
+# translations.generate_translations('.\data\dewiktionary-20180601-pages-meta-current.xml')
 # # alternatively, generate entries using a strict, non-greedy algorithm (excludes spurious explanation texts, but also incurs information loss):
 # translations.generate_translations('.\data\dewiktionary-20180601-pages-meta-current.xml', strict=True)
 # # save the resulting dictionary under the data folder of the current working dictionary:
@@ -98,17 +104,15 @@ inv_dic_commons.export_to_json('.\data\de_noun_entries_commons_inv.json')
 # Generating dictionaries from scratch (= from xml file) #
 ##########################################################
 
-# generating and saving the adjectival grammatical information dictionary:
-adj_entries = dw.GermanAdjEntriesDict()
-adj_entries.generate_entries('.\data\dewiktionary-20180601-pages-meta-current.xml')
+# generating the adjectival grammatical information dictionary (not needed if generate_dictionaries has been called as above):
+# adj_entries.generate_entries('.\data\dewiktionary-20180601-pages-meta-current.xml')
 
 # generating and saving the inverse dictionary:
 adj_entries_inv = adj_entries.make_inv_dict()
 adj_entries_inv.export_to_json('.\data\de_adj_entries_inv.json')
 
-# generating and saving the adjective translations dictionary:
-adj_translations = dw.GermanAdjTranslationDict()
-adj_translations.generate_translations('.\data\dewiktionary-20180601-pages-meta-current.xml')
+# generating the adjective translations dictionary (not needed if generate_dictionaries has been called as above):
+# adj_translations.generate_translations('.\data\dewiktionary-20180601-pages-meta-current.xml')
 
 # generating and saving the inverse dictionary:
 adj_translations_inv = adj_translations.make_inv_dict()